@@ -0,0 +1,213 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from fetch_cache import get_fetch_cache
+from http_client import record, reserve
+from resources import lazy_import
+
+# Optional full-text stage: downloads the pages behind article links with
+# asyncio (aiohttp), at most PER_HOST_CONNECTIONS per site and
+# MAX_CONNECTIONS overall, and extracts their main text. Bodies are cached by
+# normalized URL in the fetch cache, so a page is never downloaded twice, and
+# a whole batch is bounded by a time budget: pages still loading when it runs
+# out are simply left without a body. A refresh of many keywords shares one
+# batch (body_batch(), see pipeline.analyze_keywords): one connection pool,
+# so the per-site limit holds across keywords, and one budget for the refresh.
+#
+# Enable for the pipeline with NEWSTREND_FETCH_BODIES=1.
+
+FETCH_BODIES = os.environ.get("NEWSTREND_FETCH_BODIES", "") not in ("", "0")
+
+MAX_CONNECTIONS = 64
+PER_HOST_CONNECTIONS = 4
+PAGE_TIMEOUT = 10
+BODY_TIME_BUDGET = float(os.environ.get("NEWSTREND_BODY_BUDGET", 20))
+
+# Longest body kept per article, and the shortest paragraph counted as text
+MAX_BODY_CHARS = 20000
+MIN_PARAGRAPH_CHARS = 40
+
+USER_AGENT = "Mozilla/5.0 (compatible; newstrend/1.0)"
+
+# Elements whose text is never part of the article
+SKIP_TAGS = frozenset(("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figure", "svg"))
+
+class _TextExtractor(HTMLParser):
+    # Collects paragraph text, preferring paragraphs inside <article> when there are any
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip = 0
+        self.article = 0
+        self.paragraph = None
+        self.paragraphs = []
+        self.article_paragraphs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        elif tag == "article":
+            self.article += 1
+        elif tag == "p" and not self.skip:
+            self.paragraph = []
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag == "article":
+            self.article = max(0, self.article - 1)
+        elif tag == "p" and self.paragraph is not None:
+            text = " ".join("".join(self.paragraph).split())
+            if len(text) >= MIN_PARAGRAPH_CHARS:
+                (self.article_paragraphs if self.article else self.paragraphs).append(text)
+            self.paragraph = None
+
+    def handle_data(self, data):
+        if self.paragraph is not None and not self.skip:
+            self.paragraph.append(data)
+
+def extract_text(html):
+    # Main text of an HTML page: its paragraphs, or "" when it has none
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass
+    paragraphs = parser.article_paragraphs or parser.paragraphs
+    return "\n".join(paragraphs)[:MAX_BODY_CHARS]
+
+async def _download(session, url):
+    # Extracted text, "" for a page that can't be used (status, content type),
+    # or None for a transient failure that is worth trying again next refresh.
+    # Every page takes a token of the "bodies" rate limit and is counted in
+    # http_client.provider_stats().
+    aiohttp = lazy_import("aiohttp")
+    waited = reserve("bodies")
+    if waited:
+        await asyncio.sleep(waited)
+    started = time.perf_counter()
+    failed = True
+    try:
+        async with session.get(url, allow_redirects=True) as response:
+            failed = response.status >= 400
+            if response.status >= 500 or response.status == 429:
+                return None
+            if response.status >= 400 or "html" not in response.headers.get("Content-Type", ""):
+                return ""
+            failed = True
+            html = await response.text(errors="replace")
+            failed = False
+    except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError):
+        return None
+    finally:
+        record("bodies", time.perf_counter() - started, waited, error=failed)
+    return extract_text(html)
+
+def _open_session():
+    aiohttp = lazy_import("aiohttp")
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=PER_HOST_CONNECTIONS)
+    timeout = aiohttp.ClientTimeout(total=PAGE_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"User-Agent": USER_AGENT})
+
+async def _download_all(session, urls, budget, tasks=None):
+    # {url: body} for every page fetched within `budget` seconds. `tasks`
+    # ({url: task}) shares downloads between calls, so a page asked for twice
+    # is fetched once.
+    tasks = {} if tasks is None else tasks
+    waiting = {}
+    for url in urls:
+        if url not in tasks:
+            tasks[url] = asyncio.ensure_future(_download(session, url))
+        waiting[tasks[url]] = url
+    if not waiting:
+        return {}
+    done, pending = await asyncio.wait(waiting, timeout=max(budget, 0))
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return {waiting[task]: task.result() for task in done
+            if not task.cancelled() and task.exception() is None and task.result() is not None}
+
+async def download_bodies(urls, budget=BODY_TIME_BUDGET):
+    # {url: body} for every page fetched within `budget` seconds
+    async with _open_session() as session:
+        return await _download_all(session, urls, budget)
+
+class BodyBatch:
+    # One event loop (in its own thread), one connection pool and one time
+    # budget shared by every fetch_bodies call of a refresh, so the
+    # per-host limit and the budget hold for the refresh as a whole, however
+    # many keyword threads ask for pages. The budget starts with the first download.
+
+    def __init__(self, budget=BODY_TIME_BUDGET):
+        self.budget = budget
+        self.deadline = None
+        self.tasks = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="article-bodies", daemon=True)
+        self._thread.start()
+        self._session = None
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _fetch(self, urls):
+        # Runs on the batch's loop, where the session and tasks live
+        if self._session is None:
+            self._session = _open_session()
+        return await _download_all(self._session, urls, self.deadline - time.monotonic(), self.tasks)
+
+    def download(self, urls):
+        with self._lock:
+            if self.deadline is None:
+                self.deadline = time.monotonic() + self.budget
+        if time.monotonic() >= self.deadline:
+            return {}
+        return self._run(self._fetch(urls))
+
+    def close(self):
+        if self._session is not None:
+            self._run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+_batch = contextvars.ContextVar("newstrend_body_batch", default=None)
+
+@contextmanager
+def body_batch(enabled=True, budget=BODY_TIME_BUDGET):
+    # fetch_bodies calls inside the block (including worker threads started
+    # through copy_context().run) share one BodyBatch
+    if not enabled:
+        yield None
+        return
+    batch = BodyBatch(budget)
+    token = _batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _batch.reset(token)
+        batch.close()
+
+def fetch_bodies(urls, budget=BODY_TIME_BUDGET, cache=None):
+    # {url: body} for `urls`: cached bodies, plus whatever of the rest could be
+    # downloaded within the budget (which are then cached). Inside body_batch()
+    # the batch's loop and budget are used; otherwise this call runs its own
+    # event loop, so call it from a thread without one (e.g. a pipeline worker).
+    cache = cache or get_fetch_cache()
+    urls = list(dict.fromkeys(urls))
+    bodies = cache.get_bodies(urls)
+    missing = [url for url in urls if url not in bodies]
+    if missing:
+        batch = _batch.get()
+        downloaded = batch.download(missing) if batch else asyncio.run(download_bodies(missing, budget))
+        cache.put_bodies(downloaded)
+        bodies.update(downloaded)
+    return bodies
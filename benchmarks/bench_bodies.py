@@ -0,0 +1,47 @@
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Article body extraction (article_bodies.fetch_bodies) against a local stub
+# server: hundreds of pages per run, always downloaded (the cache is cold).
+
+PAGE_COUNTS = [50, 300]
+
+PAGE = ("<html><head><script>var x = 1;</script></head><body><nav><p>Home | News | Sports | Contact us today</p></nav>"
+        "<article><h1>Headline</h1><p>" + "The university announced a new program for students this fall. " * 4
+        + "</p></article><footer><p>Copyright notice and other footer text nobody reads.</p></footer></body></html>").encode("utf-8")
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+@pytest.mark.parametrize("pages", PAGE_COUNTS, ids=lambda n: f"{n}pages")
+def bench_fetch_bodies(benchmark, stub_server, tmp_path, pages):
+    from article_bodies import fetch_bodies
+    from fetch_cache import FetchCache
+    urls = [f"{stub_server}/article/{i}" for i in range(pages)]
+    runs = iter(range(1000))
+
+    def fetch():
+        # A fresh cache file per round keeps every page a download
+        cache = FetchCache(str(tmp_path / f"bodies-{next(runs)}.sqlite3"))
+        return fetch_bodies(urls, cache=cache)
+
+    bodies = benchmark.pedantic(fetch, rounds=3, iterations=1)
+    assert len(bodies) == pages and all(bodies.values())
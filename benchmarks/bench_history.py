@@ -0,0 +1,78 @@
+import pytest
+from replay import KEYWORD_COUNTS, HISTORY_DAYS, keyword_names, make_history, MemoryS3
+
+# Trend materialization and history (de)serialization, scaled by keyword
+# count and history length.
+
+@pytest.fixture(params=[(k, d) for k in KEYWORD_COUNTS for d in HISTORY_DAYS],
+                ids=lambda p: f"{p[0]}kw-{p[1]}d")
+def history(request):
+    n_keywords, n_days = request.param
+    return make_history(n_keywords, n_days), keyword_names(n_keywords)
+
+def bench_keyword_trend(benchmark, history):
+    # Every keyword's trend, as the page builds them
+    from trends import materialize_trends, keyword_trend
+    data, keywords = history
+
+    def all_trends():
+        matrix, rolling = materialize_trends(data)
+        return [keyword_trend(matrix, rolling, keyword) for keyword in keywords]
+
+    benchmark.pedantic(all_trends, rounds=3, iterations=1)
+
+def bench_chart_data(benchmark, history):
+    # Downsampled per-keyword trends plus the comparison chart, as the page sends them
+    from trends import materialize_trends, keyword_trend, downsample_trend, comparison_trends
+    data, keywords = history
+    matrix, rolling = materialize_trends(data)
+
+    def chart_data():
+        trends = [downsample_trend(keyword_trend(matrix, rolling, keyword)) for keyword in keywords]
+        return trends, comparison_trends(rolling, keywords)
+
+    benchmark.pedantic(chart_data, rounds=3, iterations=1)
+
+def bench_csv_write(benchmark, history):
+    from storage import write_history
+    data, _ = history
+    s3 = MemoryS3()
+    benchmark.pedantic(write_history, args=(s3, "bench", "history.csv", data), rounds=3, iterations=1)
+
+def bench_csv_read(benchmark, history):
+    from storage import read_history, write_history
+    data, _ = history
+    s3 = MemoryS3()
+    write_history(s3, "bench", "history.csv", data)
+    benchmark.pedantic(read_history, args=(s3, "bench", "history.csv"), rounds=3, iterations=1)
+
+def bench_parquet_read(benchmark, history, tmp_path):
+    from storage import ParquetHistoryStore
+    data, _ = history
+    store = ParquetHistoryStore(str(tmp_path / "history"))
+    store.upsert(data)
+    benchmark.pedantic(store.read, rounds=3, iterations=1)
+
+def bench_parquet_query(benchmark, history, tmp_path):
+    # One keyword's last 30 days of trend columns, as the single-keyword view reads them
+    from datetime import timedelta
+    from storage import ParquetHistoryStore
+    from trends import TREND_COLUMNS
+    data, keywords = history
+    store = ParquetHistoryStore(str(tmp_path / "history"))
+    store.upsert(data)
+    start = max(data['Date']) - timedelta(days=29)
+    benchmark.pedantic(store.read, kwargs={"keywords": keywords[:1], "start": start, "columns": TREND_COLUMNS},
+                       rounds=3, iterations=1)
+
+def bench_csv_query(benchmark, history):
+    from datetime import timedelta
+    from storage import CsvHistoryStore, write_history
+    from trends import TREND_COLUMNS
+    data, keywords = history
+    s3 = MemoryS3()
+    write_history(s3, "bench", "history.csv", data)
+    store = CsvHistoryStore(s3, "bench", "history.csv")
+    start = max(data['Date']) - timedelta(days=29)
+    benchmark.pedantic(store.read, kwargs={"keywords": keywords[:1], "start": start, "columns": TREND_COLUMNS},
+                       rounds=3, iterations=1)
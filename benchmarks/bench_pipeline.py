@@ -0,0 +1,81 @@
+import pytest
+from collections import Counter
+from replay import KEYWORD_COUNTS, keyword_names, keyword_texts
+
+# Per-stage timings of the keyword analysis in pipeline.analyze_keywords, and
+# of collegenews.py's NewsAPI search.
+
+@pytest.fixture(params=KEYWORD_COUNTS, ids=lambda n: f"{n}kw")
+def texts(request, googlenews_records):
+    return keyword_texts(googlenews_records, keyword_names(request.param))
+
+def tokenize_all(texts):
+    from resources import word_tokenize
+    return [word_tokenize(' '.join(keyword_texts).lower()) for keyword_texts in texts]
+
+def bench_tokenize(benchmark, texts):
+    benchmark(tokenize_all, texts)
+
+def bench_sentiment(benchmark, texts):
+    from sentiment import get_analyzer, score_batch
+    get_analyzer()  # lexicon loading is a one-off, not part of the stage
+    benchmark(lambda: [score_batch(keyword_texts) for keyword_texts in texts])
+
+def bench_topics_counter(benchmark, texts, stopwords):
+    from rollups import top_topics
+    tokens = tokenize_all(texts)
+
+    def topics():
+        return [top_topics(Counter(word for word in words if word.isalpha() and word not in stopwords))
+                for words in tokens]
+
+    benchmark(topics)
+
+def word_tokenize_lower(text):
+    from resources import word_tokenize
+    return word_tokenize(text.lower())
+
+def bench_topics_keyphrases(benchmark, texts, stopwords, tmp_path):
+    # Keyphrase topics against a document-frequency index holding every text once
+    from keyphrases import DocumentFrequencyIndex, candidate_phrases, rank_keyphrases
+    index = DocumentFrequencyIndex(str(tmp_path / "df_index.sqlite3"))
+    phrases = [[candidate_phrases(words, stopwords) for words in
+                (word_tokenize_lower(text) for text in keyword_texts)] for keyword_texts in texts]
+    index.add({f"{i}-{j}": text_phrases for i, keyword_phrases in enumerate(phrases)
+               for j, text_phrases in enumerate(keyword_phrases)})
+    benchmark(lambda: [rank_keyphrases(keyword_phrases, index) for keyword_phrases in phrases])
+
+def bench_wordcloud(benchmark, googlenews_records, stopwords):
+    # One keyword's word cloud; the page draws one per keyword
+    from wordclouds import render_wordcloud_png
+    words = tokenize_all(keyword_texts(googlenews_records, ["University 0"]))[0]
+    word_counts = Counter(word for word in words if word.isalpha() and word not in stopwords)
+    benchmark.pedantic(render_wordcloud_png, args=(word_counts,), rounds=5, iterations=1)
+
+def bench_wordcloud_cached(benchmark, googlenews_records, stopwords):
+    # A rerun for an unchanged keyword: digest of the frequencies plus a cache hit
+    from wordclouds import wordcloud_png
+    words = tokenize_all(keyword_texts(googlenews_records, ["University 0"]))[0]
+    word_counts = Counter(word for word in words if word.isalpha() and word not in stopwords)
+    wordcloud_png("University 0", word_counts)
+    benchmark(wordcloud_png, "University 0", word_counts)
+
+@pytest.mark.parametrize("n_keywords", KEYWORD_COUNTS[:2], ids=lambda n: f"{n}kw")
+def bench_analyze_keywords(benchmark, replayed_googlenews, stopwords, n_keywords):
+    # Fetch (replayed) plus the whole analysis stage, as newstrend.main runs it
+    keywords = keyword_names(n_keywords)
+    benchmark.pedantic(replayed_googlenews.analyze_keywords, args=(keywords, stopwords), rounds=3, iterations=1)
+
+@pytest.mark.parametrize("n_keywords", KEYWORD_COUNTS[:2], ids=lambda n: f"{n}kw")
+def bench_newsapi_search(benchmark, replayed_newsapi, n_keywords):
+    # collegenews.main's search (replayed) plus its description scoring, per keyword
+    from sentiment import get_analyzer, score_batch
+    get_analyzer()
+
+    def search_all():
+        for keyword in keyword_names(n_keywords):
+            articles = replayed_newsapi.fetch_news(keyword, target_articles=20)["articles"]
+            assert articles
+            score_batch([article["description"] or "No description available" for article in articles])
+
+    benchmark.pedantic(search_all, rounds=3, iterations=1)
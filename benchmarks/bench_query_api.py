@@ -0,0 +1,33 @@
+import pytest
+from replay import make_history, keyword_names
+
+# Query API responses (query_api.QueryApi) over a Parquet history: the first
+# request after an ingestion run, which reads the history and builds the
+# response, and repeated polling, which is served from the response cache.
+
+SIZES = [(50, 365), (500, 1825)]
+PATHS = ["/latest", "/trend?keyword=University%201&start=2026-01-01", "/topics?n=5"]
+
+@pytest.fixture(params=SIZES, ids=lambda p: f"{p[0]}kw-{p[1]}d")
+def api_factory(request, tmp_path):
+    from query_api import QueryApi
+    from storage import ParquetHistoryStore
+    n_keywords, n_days = request.param
+    store = ParquetHistoryStore(str(tmp_path / "history"))
+    store.upsert(make_history(n_keywords, n_days))
+    profiles = {"bench": {"title": "Bench", "keywords": keyword_names(n_keywords), "history_key": None}}
+    return lambda: QueryApi(profiles, "bench", lambda profile: store)
+
+@pytest.mark.parametrize("path", PATHS)
+def bench_query_cold(benchmark, api_factory, path):
+    def cold():
+        return api_factory().respond(path)
+    status, _, _ = benchmark.pedantic(cold, rounds=3, iterations=1)
+    assert status == 200
+
+@pytest.mark.parametrize("path", PATHS)
+def bench_query_cached(benchmark, api_factory, path):
+    api = api_factory()
+    api.respond(path)
+    status, _, _ = benchmark(api.respond, path)
+    assert status == 200
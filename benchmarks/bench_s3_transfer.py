@@ -0,0 +1,55 @@
+import tracemalloc
+import pytest
+from replay import make_history
+
+# History upload and download through a real boto3 client against moto's
+# in-process S3, plain vs compressed. Peak Python memory of one transfer is
+# stored in each result's extra_info.
+
+SIZES = [(50, 365), (500, 1825)]
+COMPRESSIONS = ["none", "gzip"]
+
+@pytest.fixture
+def s3():
+    moto = pytest.importorskip("moto")
+    import s3_client
+    with moto.mock_aws():
+        s3_client.reset_clients()
+        client = s3_client.get_s3_client("testing", "testing", "us-east-1")
+        client.create_bucket(Bucket="bench")
+        yield client
+    s3_client.reset_clients()
+
+@pytest.fixture(params=SIZES, ids=lambda p: f"{p[0]}kw-{p[1]}d")
+def history(request):
+    return make_history(*request.param)
+
+def _peak(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def bench_s3_upload(benchmark, s3, history, monkeypatch, compression):
+    import s3_client
+    from storage import write_history
+    monkeypatch.setattr(s3_client, "COMPRESSION", compression)
+    benchmark.pedantic(write_history, args=(s3, "bench", "history.csv", history), rounds=3, iterations=1)
+    benchmark.extra_info["object_bytes"] = s3.head_object(Bucket="bench", Key="history.csv")["ContentLength"]
+    benchmark.extra_info["peak_bytes"] = _peak(write_history, s3, "bench", "history.csv", history)
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def bench_s3_query(benchmark, s3, history, monkeypatch, compression):
+    # One keyword's rows, streamed out of the whole object
+    import s3_client
+    from storage import CsvHistoryStore, write_history
+    monkeypatch.setattr(s3_client, "COMPRESSION", compression)
+    write_history(s3, "bench", "history.csv", history)
+    store = CsvHistoryStore(s3, "bench", "history.csv")
+    keywords = history['Keyword'].iloc[:1].tolist()
+    rows = benchmark.pedantic(store.read, kwargs={"keywords": keywords}, rounds=3, iterations=1)
+    assert len(rows) == (history['Keyword'] == keywords[0]).sum()
+    benchmark.extra_info["peak_bytes"] = _peak(store.read, keywords)
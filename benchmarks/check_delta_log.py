@@ -0,0 +1,117 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import pytest
+
+# Correctness of storage.DeltaLogHistoryStore against moto's in-process S3:
+# writers that lose the conditional manifest commit must retry without losing
+# rows, and compaction must keep deltas committed while it runs.
+
+DAY = date(2026, 10, 1)
+KEYWORD = "Troy University"
+PREFIX = "news/sentiment"
+
+@pytest.fixture
+def s3():
+    moto = pytest.importorskip("moto")
+    import s3_client
+    with moto.mock_aws():
+        s3_client.reset_clients()
+        client = s3_client.get_s3_client("testing", "testing", "us-east-1")
+        client.create_bucket(Bucket="bench")
+        yield client
+    s3_client.reset_clients()
+
+def _store(s3, legacy_key=None):
+    from storage import DeltaLogHistoryStore
+    return DeltaLogHistoryStore(s3, "bench", PREFIX, legacy_key=legacy_key)
+
+def _rows(*urls):
+    # One day's row holding an article per url
+    import pandas as pd
+    from rollups import HISTORY_COLUMNS, rollup_row
+    articles = [{"url": url, "sentiment": 10.0 * (i + 1), "word_counts": {"football": 1}} for i, url in enumerate(urls)]
+    return pd.DataFrame([rollup_row(DAY, KEYWORD, articles)], columns=HISTORY_COLUMNS)
+
+def _articles(store):
+    rows = store.read(keywords=[KEYWORD])
+    assert len(rows) == 1
+    return json.loads(rows.iloc[0]['ArticleScores'])
+
+def _interleave(store, method, action, when=lambda *args: True):
+    # Run action() once, right after store.<method> returns for the first
+    # call matching `when`, so another writer commits in between
+    original = getattr(store, method)
+    done = []
+
+    def wrapped(*args):
+        result = original(*args)
+        if not done and when(*args):
+            done.append(True)
+            action()
+        return result
+
+    setattr(store, method, wrapped)
+    return done
+
+def check_conflicting_upserts_keep_both_rows(s3):
+    # Writer a reads the manifest, writer b commits, then a's conditional put
+    # fails and is retried on b's manifest
+    a, b = _store(s3), _store(s3)
+    raced = _interleave(a, "_manifest", lambda: b.upsert(_rows("https://example.com/b")))
+    a.upsert(_rows("https://example.com/a"))
+    assert raced
+    assert len(_articles(_store(s3))) == 2
+    assert _store(s3).pending_deltas() == 2
+
+def check_concurrent_upserts_keep_every_row(s3):
+    urls = [f"https://example.com/{i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        list(executor.map(lambda url: _store(s3).upsert(_rows(url)), urls))
+    assert len(_articles(_store(s3))) == len(urls)
+
+def check_compaction_keeps_delta_committed_meanwhile(s3):
+    store, writer = _store(s3), _store(s3)
+    store.upsert(_rows("https://example.com/a"))
+    # The delta lands after the snapshot was written but before the swap
+    raced = _interleave(store, "_put_rows", lambda: writer.upsert(_rows("https://example.com/b")),
+                        when=lambda key, rows: "/snapshots/" in key)
+    assert store.compact() == 1
+    assert raced
+    assert store.pending_deltas() == 1
+    assert len(_articles(_store(s3))) == 2
+
+def check_losing_compaction_gives_up(s3):
+    store, other = _store(s3), _store(s3)
+    store.upsert(_rows("https://example.com/a"))
+    store.upsert(_rows("https://example.com/b"))
+    raced = _interleave(store, "_put_rows", other.compact, when=lambda key, rows: "/snapshots/" in key)
+    assert store.compact() == 0
+    assert raced
+    snapshots = s3.list_objects_v2(Bucket="bench", Prefix=f"{PREFIX}/snapshots/").get("Contents", [])
+    assert len(snapshots) == 1
+    assert _store(s3).pending_deltas() == 0
+    assert len(_articles(_store(s3))) == 2
+
+def check_legacy_csv_is_first_snapshot(s3):
+    from storage import write_history
+    write_history(s3, "bench", f"{PREFIX}.csv", _rows("https://example.com/legacy"))
+    store = _store(s3, legacy_key=f"{PREFIX}.csv")
+    store.upsert(_rows("https://example.com/new"))
+    assert len(_articles(store)) == 2
+
+def check_legacy_lookup_failure_is_raised(s3, monkeypatch):
+    # A failed lookup must not commit a manifest that forgets the legacy CSV
+    from botocore.exceptions import ClientError
+    from storage import write_history
+    write_history(s3, "bench", f"{PREFIX}.csv", _rows("https://example.com/legacy"))
+
+    def denied(**kwargs):
+        raise ClientError({"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "HeadObject")
+
+    store = _store(s3, legacy_key=f"{PREFIX}.csv")
+    monkeypatch.setattr(s3, "head_object", denied)
+    with pytest.raises(ClientError):
+        store.upsert(_rows("https://example.com/new"))
+    monkeypatch.undo()
+    assert "Contents" not in s3.list_objects_v2(Bucket="bench", Prefix=f"{PREFIX}/manifest.json")
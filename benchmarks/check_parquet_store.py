@@ -0,0 +1,18 @@
+import pytest
+from replay import make_history
+
+# ParquetHistoryStore upserts touching more partitions than pyarrow writes by
+# default (1024), as ingest.py --import-csv does with years of legacy history.
+
+@pytest.mark.parametrize("partition_by_keyword, n_keywords, n_days",
+                         [(False, 6, 1100), (True, 3, 800)], ids=["by-date", "by-keyword"])
+def check_import_beyond_1024_partitions(tmp_path, partition_by_keyword, n_keywords, n_days):
+    from storage import ParquetHistoryStore
+    history = make_history(n_keywords, n_days)
+    keys = ['Date', 'Keyword'] if partition_by_keyword else ['Date']
+    assert len(history[keys].drop_duplicates()) > 1024
+    store = ParquetHistoryStore(str(tmp_path / "history"), partition_by_keyword=partition_by_keyword)
+    store.upsert(history)
+    stored = store.read()
+    assert len(stored) == len(history)
+    assert len(stored[keys].drop_duplicates()) == len(history[keys].drop_duplicates())
@@ -0,0 +1,54 @@
+import pytest
+
+# Everything else is imported inside the fixtures so that collecting the
+# repository from its root does not import the project's dependencies.
+
+@pytest.fixture(scope="session")
+def googlenews_records():
+    from replay import load_fixture
+    return load_fixture("googlenews_results.json")["results"]
+
+@pytest.fixture(scope="session")
+def newsapi_records():
+    from replay import load_fixture
+    return load_fixture("newsapi_everything.json")["response"]["articles"]
+
+@pytest.fixture(scope="session")
+def stopwords():
+    # The NLTK English list stands in for SmartStoplist.txt, which needs the network
+    from resources import ensure_nltk_resource, load_nltk
+    ensure_nltk_resource("stopwords")
+    return frozenset(load_nltk().corpus.stopwords.words('english'))
+
+@pytest.fixture
+def replayed_googlenews(monkeypatch, googlenews_records, tmp_path):
+    # Route pipeline.fetch_news to the recorded payload through a fresh, always-cold fetch cache
+    import pipeline
+    from fetch_cache import FetchCache
+    from replay import replay_results
+    cache = FetchCache(str(tmp_path / "fetch_cache.sqlite3"), ttl=0)
+    monkeypatch.setattr(pipeline, "search_google_news", lambda keyword, page=1, window=None: replay_results(googlenews_records, keyword))
+    monkeypatch.setattr(pipeline, "get_fetch_cache", lambda: cache)
+    return pipeline
+
+@pytest.fixture
+def replayed_newsapi(monkeypatch, newsapi_records, tmp_path):
+    # Route collegenews.fetch_news's NewsAPI requests to the recorded payload,
+    # one page of it per request, through a fresh, always-cold fetch cache
+    pytest.importorskip("streamlit")
+    pytest.importorskip("streamlit_echarts")
+    import collegenews
+    from fetch_cache import FetchCache
+    from replay import ReplayedResponse, replay_results
+    cache = FetchCache(str(tmp_path / "fetch_cache.sqlite3"), ttl=0)
+
+    def get(provider, url, params=None, **kwargs):
+        records = replay_results(newsapi_records, params["q"])
+        size = params["pageSize"]
+        return ReplayedResponse({"status": "ok", "totalResults": len(records),
+                                 "articles": records[(params["page"] - 1) * size:params["page"] * size]})
+
+    monkeypatch.setattr(collegenews.st, "secrets", {"newsapi": {"api_key": "replayed"}})
+    monkeypatch.setattr(collegenews, "get", get)
+    monkeypatch.setattr(collegenews, "get_fetch_cache", lambda: cache)
+    return collegenews
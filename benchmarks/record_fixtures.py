@@ -0,0 +1,36 @@
+import argparse
+import json
+import os
+import requests
+from GoogleNews import GoogleNews
+
+# Re-record the provider payloads the benchmarks replay. This is the only part
+# of the benchmark suite that touches the network:
+#
+#   python benchmarks/record_fixtures.py "University of Alabama" --newsapi-key ...
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def record_googlenews(query):
+    googlenews = GoogleNews()
+    googlenews.search(query)
+    return {"source": "googlenews", "query": query, "results": googlenews.result()}
+
+def record_newsapi(query, api_key):
+    response = requests.get('https://newsapi.org/v2/everything',
+                            params={'q': query, 'apiKey': api_key, 'pageSize': 100}, timeout=30)
+    return {"source": "newsapi", "query": query, "response": response.json()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Record GoogleNews/NewsAPI payloads for the benchmarks.")
+    parser.add_argument("query")
+    parser.add_argument("--newsapi-key", default=os.environ.get("NEWSAPI_KEY"))
+    args = parser.parse_args()
+    with open(os.path.join(FIXTURES_DIR, "googlenews_results.json"), "w") as f:
+        json.dump(record_googlenews(args.query), f, indent=2, default=str)
+    if args.newsapi_key:
+        with open(os.path.join(FIXTURES_DIR, "newsapi_everything.json"), "w") as f:
+            json.dump(record_newsapi(args.query, args.newsapi_key), f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import io
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Offline stand-ins for the network and S3 used by the benchmarks: recorded
+# provider payloads (see record_fixtures.py) and synthetic histories.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Sizes every scaling benchmark is parameterized over
+KEYWORD_COUNTS = [6, 50, 500]
+HISTORY_DAYS = [30, 365, 1825]
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+def keyword_names(n):
+    return [f"University {i}" for i in range(n)]
+
+def replay_results(records, keyword):
+    # The recorded payload, rotated per keyword so keywords don't all see identical text
+    start = sum(map(ord, keyword)) % len(records)
+    return [dict(record) for record in records[start:] + records[:start]]
+
+def keyword_texts(records, keywords):
+    # Per-keyword article texts, built the way pipeline.analyze_keyword builds them
+    return [[f"{record['title']} {record['desc']}" for record in replay_results(records, keyword)]
+            for keyword in keywords]
+
+class ReplayedResponse:
+    # Just enough of a requests.Response for a recorded JSON payload
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+def make_history(n_keywords, n_days, missing=0.3, seed=0):
+    # One row per (day, keyword) with a share of rows dropped, so trends need gap filling
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end="2026-10-01", periods=n_days).date
+    keywords = keyword_names(n_keywords)
+    history = pd.DataFrame({
+        "Date": np.repeat(dates, n_keywords),
+        "Keyword": np.tile(keywords, n_days),
+        "Topics": "university, students, campus, research, football",
+        "Sentiment": rng.uniform(-100, 100, n_days * n_keywords),
+    })
+    keep = rng.random(len(history)) >= missing
+    keep[:n_keywords] = True  # every keyword starts on the first day
+    return history[keep].reset_index(drop=True)
+
+class MemoryS3:
+    # Just enough of the boto3 S3 client for storage.read_history/write_history
+
+    class exceptions:
+        NoSuchKey = KeyError
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body.encode("utf-8") if isinstance(Body, str) else Body
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        self.objects[(Bucket, Key)] = Fileobj.read()
@@ -1,27 +1,23 @@
+import os
 import streamlit as st
-import requests
-import nltk
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
 from streamlit_echarts import st_echarts  # Import for echarts
+from resources import lazy_import, load_stoplist
+from sentiment import score_batch
+from fetch_cache import get_fetch_cache, fetch_pages, pages_for
+from http_client import get
+from pipeline import time_window, window_key
+from wordclouds import wordcloud_png
 
-# Function to fetch custom stopwords
+# Function to fetch custom stopwords; served from the local copy after the first download
 def get_custom_stopwords(url):
-    response = requests.get(url)
-    stopwords = set(response.text.split())
-    return stopwords
+    return load_stoplist(url)
 
-def plot_wordcloud(words):
+def plot_wordcloud(query, words):
     custom_stopwords_url = "https://github.com/aneesha/RAKE/raw/master/SmartStoplist.txt"
     custom_stopwords = get_custom_stopwords(custom_stopwords_url)
-    wordcloud = WordCloud(width=800, height=800,
-                          background_color='white',
-                          stopwords=custom_stopwords,
-                          min_font_size=10).generate(words)
-    fig, ax = plt.subplots(figsize=(8, 8))
-    ax.imshow(wordcloud)
-    ax.axis("off")
-    st.pyplot(fig)
+    word_counts = lazy_import("wordcloud").WordCloud(stopwords=custom_stopwords).process_text(words)
+    if word_counts:
+        st.image(wordcloud_png(query, word_counts))
 
 def render_sentiment_gauge(score):
     # Determine the color based on the sentiment score
@@ -74,45 +70,73 @@ def render_sentiment_gauge(score):
     }
     st_echarts(options=option, height="400px")
 
-def analyze_sentiment(text):
-    nltk.download("vader_lexicon", quiet=True)
-    from nltk.sentiment.vader import SentimentIntensityAnalyzer
-    sid = SentimentIntensityAnalyzer()
-    sentiment = sid.polarity_scores(text)
-    sentiment_score = sentiment['compound'] * 100  # Scale to percentage for gauge
-    return sentiment_score
+# NewsAPI returns at most this many articles per page, and (on developer
+# plans) at most NEWSAPI_MAX_RESULTS per query: pages beyond it fail with
+# HTTP 426 maximumResultsReached
+NEWSAPI_MAX_PAGE_SIZE = 100
+NEWSAPI_MAX_RESULTS = int(os.environ.get("NEWSTREND_NEWSAPI_MAX_RESULTS", 100))
 
-def fetch_news(query):
+def fetch_news(query, target_articles=10, days=0):
+    # About `target_articles` articles, fetched as parallel pages of up to 100;
+    # `days` limits the search to the last N days through from/to.
+    # The target is capped at what the plan allows.
     ENDPOINT = 'https://newsapi.org/v2/everything'
+    target_articles = min(target_articles, NEWSAPI_MAX_RESULTS)
+    page_size = min(target_articles, NEWSAPI_MAX_PAGE_SIZE)
+    pages = pages_for(target_articles, page_size)
     params = {
         'q': query,
         'apiKey': st.secrets["newsapi"]["api_key"],
-        'pageSize': 10,  # Retrieve the top 10 articles
+        'pageSize': page_size,
     }
-    response = requests.get(ENDPOINT, params=params)
-    return response.json()
+    window = time_window(days)
+    if window:
+        params['from'], params['to'] = (day.isoformat() for day in window)
+
+    def search_page(page):
+        response = get("newsapi", ENDPOINT, params={**params, 'page': page})
+        return response.json().get("articles") or []
+
+    def search():
+        return fetch_pages(search_page, pages, url_field="url")[:target_articles]
+
+    # Served from the on-disk fetch cache while fresh, de-duplicated by URL
+    return {"articles": get_fetch_cache().fetch("newsapi", query, search, url_field="url",
+                                                time_window=f"size={page_size};{window_key(pages, window)}")}
 
 def main():
     st.title("News Feed Analyzer")
     query = st.text_input("Enter news keyword to search:")
+    target_articles = st.sidebar.number_input("Articles to fetch", min_value=10,
+                                              max_value=max(10, NEWSAPI_MAX_RESULTS), value=10, step=10)
+    days = st.sidebar.number_input("Only the last N days (0 for any date)", min_value=0, max_value=30, value=0)
     if st.button("Search"):
-        results = fetch_news(query)
+        try:
+            results = fetch_news(query, target_articles=int(target_articles), days=int(days))
+        except Exception as e:
+            st.error(f"Failed to fetch news for {query}: {e}")
+            return
         news_text = ""
+        descriptions = []
         if results.get("articles"):
             for article in results["articles"]:
                 title = article['title']
                 description = article['description'] or "No description available"
                 url = article['url']
                 news_text += description + " "
+                descriptions.append(description)
                 st.markdown(f"#### [{title}]({url})")
                 st.markdown(f"*{description}*")
                 st.markdown("---")
             if news_text:
                 st.write("Aggregate Word Cloud:")
-                plot_wordcloud(news_text)
-                sentiment_score = analyze_sentiment(news_text)
+                plot_wordcloud(query, news_text)
+                # Each description is scored separately; the gauge shows their mean
+                scores, stats = score_batch(descriptions)
                 st.write("Aggregate Sentiment:")
-                render_sentiment_gauge(sentiment_score)
+                render_sentiment_gauge(round(stats["mean"], 1))
+                st.caption(f"{stats['count']} articles: median {stats['median']:.1f}, stdev {stats['stdev']:.1f}; "
+                           f"{stats['positive']} positive, {stats['negative']} negative")
         else:
             st.write("No results found.")
 
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# On-disk cache of news search results, shared by every process that uses the
+# same file. Results are keyed by (source, query, time_window) and expire after a
+# TTL; articles are stored once per normalized URL, so the same story returned
+# by several queries or runs is kept (and handed back) only once per result.
+# Extracted article bodies (see article_bodies.py) are kept per normalized URL
+# for BODY_TTL, so no page is downloaded twice. Expired rows are purged by
+# ingest.py after every run and by any process at most every PURGE_INTERVAL.
+
+DEFAULT_PATH = os.environ.get("NEWSTREND_FETCH_CACHE", os.path.join(os.getcwd(), "fetch_cache.sqlite3"))
+DEFAULT_TTL = int(os.environ.get("NEWSTREND_FETCH_CACHE_TTL", 3600))
+# Article bodies are kept this long after they were fetched
+BODY_TTL = int(os.environ.get("NEWSTREND_BODY_TTL", 30 * 24 * 3600))
+# A long-running process purges its cache at most this often (see get_fetch_cache)
+PURGE_INTERVAL = 24 * 3600
+
+# Upper bound on result pages of one query fetched at the same time
+PAGE_WORKERS = int(os.environ.get("NEWSTREND_PAGE_WORKERS", 4))
+
+# Query parameters that only track the click and never change the article
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ocid", "cmpid")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    source TEXT NOT NULL,
+    query TEXT NOT NULL,
+    time_window TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (source, query, time_window)
+);
+CREATE TABLE IF NOT EXISTS query_articles (
+    source TEXT NOT NULL,
+    query TEXT NOT NULL,
+    time_window TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    url_key TEXT NOT NULL REFERENCES articles (url_key),
+    PRIMARY KEY (source, query, time_window, position)
+);
+CREATE TABLE IF NOT EXISTS bodies (
+    url_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    body TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+def normalize_url(url):
+    # Lower-case scheme and host, drop "www.", fragments, tracking parameters
+    # and trailing slashes so trivially different links map to one article
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not key.lower().startswith(TRACKING_PARAMS)))
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/"), query, ""))
+
+def url_key(url):
+    return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+
+def dedupe_articles(articles, url_field):
+    # Keep the first article for each normalized URL, preserving order
+    seen = set()
+    unique = []
+    for article in articles:
+        key = url_key(article[url_field])
+        if key not in seen:
+            seen.add(key)
+            unique.append(article)
+    return unique
+
+def pages_for(target_articles, page_size):
+    # Result pages needed for about `target_articles` articles
+    return max(1, -(-target_articles // page_size))
+
+def fetch_pages(fetch_page, pages, url_field, max_workers=PAGE_WORKERS):
+    # Call fetch_page(1..pages) concurrently and merge the pages in order,
+    # de-duplicated by URL; wall-clock time grows with pages / max_workers.
+    # A failed page is skipped (providers routinely refuse pages past a plan's
+    # limit); only when every page fails is the first page's error raised.
+    if pages <= 1:
+        return dedupe_articles(fetch_page(1) or [], url_field)
+    with ThreadPoolExecutor(max_workers=min(max_workers, pages)) as executor:
+        futures = [executor.submit(fetch_page, page) for page in range(1, pages + 1)]
+        results, errors = [], []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(e)
+    if not results:
+        raise errors[0]
+    return dedupe_articles([article for page in results for article in page or []], url_field)
+
+class FetchCache:
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, body_ttl=BODY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.body_ttl = body_ttl
+        self.purged_at = None
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def get(self, source, query, time_window=""):
+        # Cached articles in their original order, or None when missing or expired
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fetched_at FROM queries WHERE source = ? AND query = ? AND time_window = ?",
+                (source, query, time_window)).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                return None
+            rows = self._connection.execute(
+                "SELECT a.payload FROM query_articles q JOIN articles a ON a.url_key = q.url_key "
+                "WHERE q.source = ? AND q.query = ? AND q.time_window = ? ORDER BY q.position",
+                (source, query, time_window)).fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def put(self, source, query, time_window, articles, url_field):
+        # Store a fresh result; returns the de-duplicated articles as cached
+        articles = dedupe_articles(articles, url_field)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM query_articles WHERE source = ? AND query = ? AND time_window = ?",
+                (source, query, time_window))
+            for position, article in enumerate(articles):
+                key = url_key(article[url_field])
+                # Articles are immutable once stored: later sightings reuse the first copy
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO articles (url_key, url, payload, first_seen) VALUES (?, ?, ?, ?)",
+                    (key, article[url_field], json.dumps(article, default=str), now))
+                self._connection.execute(
+                    "INSERT INTO query_articles (source, query, time_window, position, url_key) VALUES (?, ?, ?, ?, ?)",
+                    (source, query, time_window, position, key))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO queries (source, query, time_window, fetched_at) VALUES (?, ?, ?, ?)",
+                (source, query, time_window, now))
+        return self.get(source, query, time_window)
+
+    def fetch(self, source, query, fetch, url_field, time_window=""):
+        # Return cached articles, or call fetch() and cache a non-empty result
+        articles = self.get(source, query, time_window)
+        if articles is not None:
+            return articles
+        articles = fetch()
+        if not articles:
+            return articles
+        return self.put(source, query, time_window, articles, url_field)
+
+    def get_bodies(self, urls):
+        # {url: body} for the urls whose body is cached
+        keys = {url_key(url): url for url in urls}
+        found = {}
+        with self._lock:
+            items = list(keys.items())
+            for i in range(0, len(items), 500):
+                chunk = dict(items[i:i + 500])
+                rows = self._connection.execute(
+                    f"SELECT url_key, body FROM bodies WHERE url_key IN ({', '.join('?' * len(chunk))})",
+                    list(chunk)).fetchall()
+                found.update((chunk[key], body) for key, body in rows)
+        return found
+
+    def put_bodies(self, bodies):
+        # Store {url: body}; "" marks a page that had no extractable text
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO bodies (url_key, url, body, fetched_at) VALUES (?, ?, ?, ?)",
+                [(url_key(url), url, body, now) for url, body in bodies.items()])
+
+    def purge(self):
+        # Drop expired results, articles no longer referenced by any result and expired bodies
+        with self._lock, self._connection:
+            self.purged_at = time.time()
+            cutoff = self.purged_at - self.ttl
+            self._connection.execute(
+                "DELETE FROM query_articles WHERE (source, query, time_window) IN "
+                "(SELECT source, query, time_window FROM queries WHERE fetched_at < ?)", (cutoff,))
+            self._connection.execute("DELETE FROM queries WHERE fetched_at < ?", (cutoff,))
+            self._connection.execute(
+                "DELETE FROM articles WHERE url_key NOT IN (SELECT url_key FROM query_articles)")
+            self._connection.execute("DELETE FROM bodies WHERE fetched_at < ?", (self.purged_at - self.body_ttl,))
+
+    def purge_if_due(self, interval=PURGE_INTERVAL):
+        if self.purged_at is None or time.time() - self.purged_at >= interval:
+            self.purge()
+
+_fetch_cache = None
+_fetch_cache_lock = threading.Lock()
+
+def get_fetch_cache():
+    # One cache per process, opened on first use and purged on opening and
+    # then daily, so long-running servers don't grow it forever
+    global _fetch_cache
+    if _fetch_cache is None:
+        with _fetch_cache_lock:
+            if _fetch_cache is None:
+                _fetch_cache = FetchCache()
+    _fetch_cache.purge_if_due()
+    return _fetch_cache
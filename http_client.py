@@ -0,0 +1,202 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from resources import lazy_import
+
+# The one way this app talks to the network. Every provider gets:
+#   - a shared requests.Session (connection pooling and keep-alive),
+#   - a timeout on every request,
+#   - retries with exponential backoff on connection errors, 429 and 5xx,
+#   - a token-bucket rate limit shared by every thread of the process,
+#   - request counts and latencies, reported by provider_stats().
+# Libraries that do their own HTTP (GoogleNews) go through call(), which
+# applies the same rate limit, retries and accounting around the library call;
+# asyncio code (article_bodies.py) uses reserve() and record().
+
+# Requests per second and burst size per provider; unknown providers use "default".
+# Override one with e.g. NEWSTREND_RATE_NEWSAPI="0.5/2".
+RATE_LIMITS = {
+    "googlenews": (1.0, 2),
+    "newsapi": (1.0, 5),
+    # Article pages (article_bodies.py): spread over many sites, which
+    # PER_HOST_CONNECTIONS protects individually
+    "bodies": (20.0, 20),
+    "default": (5.0, 10),
+}
+
+DEFAULT_TIMEOUT = 15
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+POOL_SIZE = 32
+
+# Latencies kept per provider for the percentiles in provider_stats()
+LATENCY_SAMPLES = 1000
+
+class TokenBucket:
+    # Allows `rate` acquisitions per second on average and at most `burst` at once
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Block until a token is available; returns the seconds spent waiting
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def reserve(self):
+        # Take a token now, going into debt if there is none; returns the
+        # seconds to wait before using it. For asyncio code, which can't block.
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+class ProviderMetrics:
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, latency, waited, error=False, retried=False):
+        # One attempt: its latency, the time it waited for a token, and its outcome
+        with self._lock:
+            self.requests += 1
+            self.errors += bool(error)
+            self.retries += bool(retried)
+            self.throttled += waited
+            self.latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = {"requests": self.requests, "errors": self.errors, "retries": self.retries,
+                     "throttled_seconds": round(self.throttled, 3)}
+        if latencies:
+            stats.update({
+                "latency_mean": sum(latencies) / len(latencies),
+                "latency_p50": latencies[len(latencies) // 2],
+                "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "latency_max": latencies[-1],
+            })
+        return stats
+
+class RetryableError(Exception):
+    # Raised by call()'s function for a failure worth retrying (e.g. HTTP 429)
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+_buckets = {}
+_metrics = {}
+_session = None
+_lock = threading.Lock()
+
+def rate_limit(provider):
+    env = os.environ.get(f"NEWSTREND_RATE_{provider.upper()}")
+    if env:
+        rate, burst = env.split("/")
+        return float(rate), int(burst)
+    return RATE_LIMITS.get(provider, RATE_LIMITS["default"])
+
+def _provider(provider):
+    with _lock:
+        if provider not in _buckets:
+            _buckets[provider] = TokenBucket(*rate_limit(provider))
+            _metrics[provider] = ProviderMetrics()
+        return _buckets[provider], _metrics[provider]
+
+def get_session():
+    # One pooled session per process, created on first use
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                requests = lazy_import("requests")
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def reserve(provider):
+    # Seconds an asyncio caller must sleep before its next request to `provider`
+    return _provider(provider)[0].reserve()
+
+def record(provider, latency, waited=0.0, error=False, retried=False):
+    # Account a request made outside call(), e.g. with aiohttp
+    _provider(provider)[1].record(latency, waited, error=error, retried=retried)
+
+def backoff(attempt, retry_after=None):
+    # Seconds to wait before retry number `attempt` (0-based), with jitter
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def call(provider, fn, retries=MAX_RETRIES, retry_on=(Exception,)):
+    # Run fn() under the provider's rate limit, retrying failures in
+    # `retry_on` (and RetryableError) with backoff; every attempt takes a token
+    bucket, metrics = _provider(provider)
+    attempt = 0
+    while True:
+        waited = bucket.acquire()
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except (RetryableError,) + tuple(retry_on) as e:
+            retry = attempt < retries
+            metrics.record(time.perf_counter() - started, waited, error=True, retried=retry)
+            if not retry:
+                raise
+            time.sleep(backoff(attempt, getattr(e, "retry_after", None)))
+            attempt += 1
+            continue
+        metrics.record(time.perf_counter() - started, waited)
+        return result
+
+def get(provider, url, params=None, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, **kwargs):
+    # GET through the shared session. Connection errors, timeouts, 429 and 5xx
+    # are retried; other non-2xx responses raise requests.HTTPError at once
+    requests = lazy_import("requests")
+
+    def request():
+        response = get_session().get(url, params=params, timeout=timeout, **kwargs)
+        if response.status_code in RETRY_STATUSES:
+            retry_after = response.headers.get("Retry-After")
+            raise RetryableError(f"HTTP {response.status_code} from {provider}",
+                                 retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        response.raise_for_status()
+        return response
+
+    return call(provider, request, retries=retries,
+                retry_on=(requests.ConnectionError, requests.Timeout))
+
+def provider_stats():
+    # {provider: request counts, retries, time spent throttled and latency percentiles}
+    with _lock:
+        metrics = dict(_metrics)
+    return {provider: m.snapshot() for provider, m in sorted(metrics.items())}
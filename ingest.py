@@ -0,0 +1,159 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from functools import partial
+from pipeline import (MAX_WORKERS, CUSTOM_STOPWORDS_URL, fetch_custom_stopwords, analyze_keyword,
+                      analyze_keywords, search_depth)
+from fetch_cache import get_fetch_cache
+from http_client import provider_stats
+import instrumentation
+from instrumentation import record_run, stage
+from profiles import load_profiles, union_keywords
+from rollups import rollups_from_results
+from storage import COMPACT_AFTER_DELTAS, make_s3_client, read_history, make_history_store
+
+# Headless ingestion runner, meant to be run from cron:
+#
+#   python ingest.py --history-uri s3://my-bucket/news/history
+#   python ingest.py --bucket my-bucket --object-key news/sentiment.csv
+#
+# It fetches and analyzes every keyword, folds the articles into today's
+# rollup rows in the history store (see rollups.py) and stores the full
+# results of the run as a snapshot that the Streamlit page renders instead of
+# running the pipeline itself.
+# --history-uri selects the partitioned Parquet store (a local directory or an
+# s3:// URI); without it the legacy CSV object is used, or with --delta-log
+# an append-only log of deltas next to it (compacted once COMPACT_AFTER_DELTAS
+# deltas are pending, or on demand with --compact).
+# Every profile in profiles.json is refreshed (or only those given with
+# --profile), each into its own history; keywords shared between profiles
+# are fetched and analyzed once.
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch and analyze news for all keywords and store the results.")
+    parser.add_argument("--history-uri", default=os.environ.get("NEWSTREND_HISTORY_URI"),
+                        help="Parquet history store: local directory or s3://bucket/prefix (default: $NEWSTREND_HISTORY_URI)")
+    parser.add_argument("--partition-by-keyword", action="store_true",
+                        help="Partition the Parquet store by keyword as well as by date")
+    parser.add_argument("--bucket", default=os.environ.get("NEWSTREND_BUCKET"),
+                        help="S3 bucket of the CSV history (default: $NEWSTREND_BUCKET)")
+    parser.add_argument("--object-key", default=os.environ.get("NEWSTREND_OBJECT_KEY"),
+                        help="S3 key of the CSV history (default: $NEWSTREND_OBJECT_KEY)")
+    parser.add_argument("--delta-log", action="store_true", default=os.environ.get("NEWSTREND_DELTA_LOG", "") not in ("", "0"),
+                        help="Store the CSV history as an append-only delta log (default: $NEWSTREND_DELTA_LOG)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Compact the delta log of every selected profile and exit")
+    parser.add_argument("--import-csv", action="store_true",
+                        help="Copy the CSV history at --bucket/--object-key into the Parquet store and exit")
+    parser.add_argument("--profile", action="append", dest="profiles",
+                        help="Profile to refresh; repeat for several (default: all profiles)")
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--timings", action="store_true",
+                        help="Print per-stage timings of the run (always recorded and exported when $NEWSTREND_TIMINGS is set)")
+    parser.add_argument("--pages", type=int,
+                        help="Result pages to fetch per keyword (default: $NEWSTREND_FETCH_PAGES or 1)")
+    parser.add_argument("--target-articles", type=int,
+                        help="Fetch enough pages for about this many articles per keyword (overrides --pages)")
+    parser.add_argument("--days", type=int,
+                        help="Only search news from the last DAYS days (default: $NEWSTREND_FETCH_DAYS; 0 for no limit)")
+    args = parser.parse_args(argv)
+    if not args.history_uri and not (args.bucket and args.object_key):
+        parser.error("either --history-uri or --bucket and --object-key are required")
+    if args.import_csv and not (args.history_uri and args.bucket and args.object_key):
+        parser.error("--import-csv needs --history-uri, --bucket and --object-key")
+    if args.compact and (args.history_uri or not args.delta_log):
+        parser.error("--compact needs --delta-log (and no --history-uri)")
+    return args
+
+def analyze(keywords, max_workers=MAX_WORKERS, depth=None):
+    try:
+        custom_stopwords = frozenset(fetch_custom_stopwords(CUSTOM_STOPWORDS_URL))
+    except Exception as e:
+        print(f"Failed to fetch custom stopwords: {e}", file=sys.stderr)
+        custom_stopwords = frozenset()
+
+    results = analyze_keywords(keywords, custom_stopwords, max_workers=max_workers,
+                               analyze=partial(analyze_keyword, **(depth or search_depth())))
+    for result in results:
+        if result["error"]:
+            print(result["error"], file=sys.stderr)
+    return results
+
+def persist(store, results):
+    today = datetime.now().date()
+    with stage("upsert_history"):
+        store.upsert(rollups_from_results(results, today, store.read(start=today, end=today)))
+    if hasattr(store, "compact") and store.pending_deltas() >= COMPACT_AFTER_DELTAS:
+        with stage("compact_history"):
+            store.compact()
+    with stage("write_latest"):
+        store.write_latest({
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "results": results,
+        })
+
+def run(profiles, store_for, max_workers=MAX_WORKERS, depth=None):
+    # Analyze the union of the profiles' keywords once, then store each
+    # profile's share of the results in its own history
+    results = analyze(union_keywords(profiles.values()), max_workers=max_workers, depth=depth)
+    by_keyword = {result["keyword"]: result for result in results}
+    for name, profile in profiles.items():
+        store = store_for(profile)
+        persist(store, [by_keyword[keyword] for keyword in profile["keywords"]])
+        print(f"Profile {name}: results stored in {store!r}")
+    with stage("purge_fetch_cache"):
+        get_fetch_cache().purge()
+    return results
+
+def import_csv(bucket, object_key, store):
+    # Duplicate (Date, Keyword) rows in the CSV collapse to the last one
+    historical_data = read_history(make_s3_client(), bucket, object_key)
+    store.upsert(historical_data)
+    return len(historical_data)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    def store_for(profile):
+        return make_history_store(history_uri=args.history_uri, bucket=args.bucket, object_key=args.object_key,
+                                  partition_by_keyword=args.partition_by_keyword,
+                                  history_key=profile["history_key"], delta_log=args.delta_log)
+
+    profiles, _ = load_profiles()
+    if args.profiles:
+        unknown = [name for name in args.profiles if name not in profiles]
+        if unknown:
+            print(f"Unknown profile(s): {', '.join(unknown)}", file=sys.stderr)
+            return 2
+        profiles = {name: profiles[name] for name in args.profiles}
+
+    if args.compact:
+        for name, profile in profiles.items():
+            store = store_for(profile)
+            print(f"Profile {name}: compacted {store.compact()} delta(s) in {store!r}")
+        return 0
+
+    if args.import_csv:
+        # The imported CSV is the pre-profile history, which belongs to the default profile location
+        store = make_history_store(history_uri=args.history_uri, partition_by_keyword=args.partition_by_keyword)
+        imported = import_csv(args.bucket, args.object_key, store)
+        print(f"Imported {imported} rows from s3://{args.bucket}/{args.object_key} into {store!r}")
+        return 0
+
+    depth = search_depth(pages=args.pages, target_articles=args.target_articles, days=args.days)
+    with record_run("ingest", enabled=args.timings or instrumentation.ENABLED) as timings:
+        results = run(profiles, store_for, max_workers=args.max_workers, depth=depth)
+    if args.timings:
+        for name, entry in sorted(timings.summary().items(), key=lambda item: -item[1]["total"]):
+            print(f"{name}: {entry['total']:.3f}s total over {entry['count']} call(s), max {entry['max']:.3f}s",
+                  file=sys.stderr)
+    analyzed = sum(1 for result in results if "sentiment" in result)
+    print(f"Analyzed {analyzed}/{len(results)} distinct keywords across {len(profiles)} profile(s)")
+    for provider, stats in provider_stats().items():
+        print(f"{provider}: {stats['requests']} requests, {stats['errors']} errors, {stats['retries']} retries, "
+              f"{stats['throttled_seconds']}s throttled, p95 {stats.get('latency_p95', 0):.3f}s", file=sys.stderr)
+    return 0 if analyzed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# Per-stage timings of one run (a page render or an ingest run), broken down
+# by keyword. Code marks its stages with
+#
+#   with stage("tokenize"):            or    @timed_stage("fetch_news")
+#
+# and a caller that wants the numbers wraps the run in `with record_run() as run:`.
+# Outside a recorded run a stage is a no-op costing one context variable
+# lookup, so instrumentation can stay in the hot paths. Stages inherit the
+# keyword set by keyword_scope(); worker threads see the run (and keyword) of
+# the code that submitted them when started through copy_context().run (see
+# pipeline.analyze_keywords).
+#
+# Finished runs can be exported as JSON lines (one line per stage timing) and
+# as Prometheus text format: a histogram per stage accumulated over every run
+# of the process, written whole for a node_exporter textfile collector.
+
+ENABLED = os.environ.get("NEWSTREND_TIMINGS", "") not in ("", "0")
+JSONL_PATH = os.environ.get("NEWSTREND_TIMINGS_JSONL")
+PROMETHEUS_PATH = os.environ.get("NEWSTREND_TIMINGS_PROM")
+
+# Histogram buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_run = contextvars.ContextVar("newstrend_run", default=None)
+_keyword = contextvars.ContextVar("newstrend_keyword", default=None)
+_null = nullcontext()
+
+class Run:
+
+    def __init__(self, name):
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, keyword, seconds):
+        with self._lock:
+            self.records.append((stage, keyword, seconds))
+
+    def summary(self):
+        # {stage: {"count", "total", "max"}} over the whole run
+        totals = {}
+        with self._lock:
+            records = list(self.records)
+        for stage, keyword, seconds in records:
+            entry = totals.setdefault(stage, {"count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+        return totals
+
+    def by_keyword(self):
+        # {keyword: {stage: total seconds}}; stages outside any keyword are left out
+        totals = {}
+        with self._lock:
+            records = list(self.records)
+        for stage, keyword, seconds in records:
+            if keyword is not None:
+                stages = totals.setdefault(keyword, {})
+                stages[stage] = stages.get(stage, 0.0) + seconds
+        return totals
+
+@contextmanager
+def _timing(run, name, keyword):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add(name, keyword, time.perf_counter() - started)
+
+def stage(name, keyword=None):
+    # Time the enclosed block as stage `name` of the current run, if any
+    run = _run.get()
+    if run is None:
+        return _null
+    return _timing(run, name, keyword or _keyword.get())
+
+def timed_stage(name):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextmanager
+def keyword_scope(keyword):
+    # Attribute the stages of the enclosed block to `keyword`
+    token = _keyword.set(keyword)
+    try:
+        yield
+    finally:
+        _keyword.reset(token)
+
+@contextmanager
+def record_run(name, enabled=True):
+    # Collect the stage timings of the enclosed block; yields the Run, or
+    # None when disabled. The run is exported when export paths are configured.
+    if not enabled:
+        yield None
+        return
+    run = Run(name)
+    token = _run.set(run)
+    try:
+        with _timing(run, "total", None):
+            yield run
+    finally:
+        _run.reset(token)
+        export(run)
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def _observe(run):
+    with _histograms_lock:
+        for stage, keyword, seconds in run.records:
+            histogram = _histograms.setdefault((run.name, stage), {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+def prometheus_text():
+    # Every stage histogram of this process in Prometheus text exposition format
+    lines = ["# HELP newstrend_stage_seconds Time spent in each stage of a run.",
+             "# TYPE newstrend_stage_seconds histogram"]
+    with _histograms_lock:
+        for (run_name, stage_name), histogram in sorted(_histograms.items()):
+            labels = f'run="{run_name}",stage="{stage_name}"'
+            for bound, count in zip(BUCKETS, histogram["buckets"]):
+                lines.append(f'newstrend_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'newstrend_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f"newstrend_stage_seconds_sum{{{labels}}} {histogram['sum']:.6f}")
+            lines.append(f"newstrend_stage_seconds_count{{{labels}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+def export(run, jsonl_path=None, prometheus_path=None):
+    jsonl_path = jsonl_path or JSONL_PATH
+    prometheus_path = prometheus_path or PROMETHEUS_PATH
+    _observe(run)
+    if jsonl_path:
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            for stage_name, keyword, seconds in run.records:
+                f.write(json.dumps({"run": run.name, "run_id": run.id, "started": run.started,
+                                    "stage": stage_name, "keyword": keyword, "seconds": round(seconds, 6)}) + "\n")
+    if prometheus_path:
+        # Written to a temporary file and renamed, so the collector never reads half a file
+        temporary = f"{prometheus_path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(temporary, prometheus_path)
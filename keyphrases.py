@@ -0,0 +1,122 @@
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+# Keyphrases for the "topics" of a keyword: RAKE-style candidate phrases (the
+# 1-3 word n-grams inside runs of words between stopwords and punctuation)
+# ranked by TF-IDF, where document frequencies come from every article seen so
+# far. Phrases common to the whole corpus ("university", "students") sink, and
+# phrases that distinguish one school's coverage rise.
+#
+# The document-frequency index is a SQLite file that grows incrementally: each
+# article (keyed by URL) is added once, costing one update per distinct phrase
+# in it, and scoring only looks up the phrases being ranked. The file is shared
+# by ingest.py and the Streamlit server, so the document count is read from it
+# at every scoring, never cached.
+
+DEFAULT_PATH = os.environ.get("NEWSTREND_DF_INDEX", os.path.join(os.getcwd(), "df_index.sqlite3"))
+
+# Longest candidate phrase, in words
+MAX_PHRASE_WORDS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_key TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) SELECT 'documents', COUNT(*) FROM documents;
+"""
+
+def candidate_phrases(tokens, stopwords, max_words=MAX_PHRASE_WORDS):
+    # The n-grams (up to max_words) of each run of non-stopword alphabetic
+    # tokens; a phrase never spans a stopword or punctuation
+    phrases = []
+    run = []
+    for token in list(tokens) + [None]:
+        if token is not None and token.isalpha() and token not in stopwords:
+            run.append(token)
+            continue
+        for size in range(1, max_words + 1):
+            phrases.extend(" ".join(run[i:i + size]) for i in range(len(run) - size + 1))
+        run = []
+    return phrases
+
+class DocumentFrequencyIndex:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def add(self, documents):
+        # Count {doc_key: phrases} documents not seen before; returns how many were new
+        with self._lock, self._connection:
+            added = 0
+            for doc_key, phrases in documents.items():
+                if self._connection.execute("INSERT OR IGNORE INTO documents (doc_key) VALUES (?)",
+                                            (doc_key,)).rowcount == 0:
+                    continue
+                self._connection.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT (term) DO UPDATE SET df = df + 1",
+                    [(phrase,) for phrase in set(phrases)])
+                added += 1
+            self._connection.execute("UPDATE counters SET value = value + ? WHERE name = 'documents'", (added,))
+        return added
+
+    def _document_count(self):
+        return self._connection.execute("SELECT value FROM counters WHERE name = 'documents'").fetchone()[0]
+
+    def idf(self, phrases):
+        # Smoothed inverse document frequency of each phrase
+        phrases = list(set(phrases))
+        df = {}
+        with self._lock:
+            for i in range(0, len(phrases), 500):
+                chunk = phrases[i:i + 500]
+                df.update(self._connection.execute(
+                    f"SELECT term, df FROM terms WHERE term IN ({', '.join('?' * len(chunk))})", chunk).fetchall())
+            # Read after the frequencies: the count only grows, and grows in the
+            # same transaction as they do, so it is never below any df just read
+            documents = self._document_count()
+        return {phrase: math.log((documents + 1) / (df.get(phrase, 0) + 1)) + 1 for phrase in phrases}
+
+def rank_keyphrases(text_phrases, index, exclude=(), n=5):
+    # Top n phrases of a keyword's texts by (texts containing it) x idf.
+    # Phrases containing `exclude` words (the keyword itself) are skipped, as
+    # are phrases overlapping a better one ("team" after "football team").
+    exclude = set(exclude)
+    tf = Counter()
+    for phrases in text_phrases:
+        tf.update(phrase for phrase in set(phrases) if not exclude & set(phrase.split()))
+    idf = index.idf(tf)
+    chosen = []
+    for phrase in sorted(tf, key=lambda phrase: (-tf[phrase] * idf[phrase], phrase)):
+        if any(f" {phrase} " in f" {other} " or f" {other} " in f" {phrase} " for other in chosen):
+            continue
+        chosen.append(phrase)
+        if len(chosen) == n:
+            break
+    return chosen
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_df_index():
+    # One index per process, opened on first use
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DocumentFrequencyIndex()
+    return _index
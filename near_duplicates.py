@@ -0,0 +1,161 @@
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+import numpy as np
+
+# Near-duplicate detection for syndicated stories: a MinHash signature of each
+# article's text (title + description, plus the body when fetched), persisted
+# in SQLite with its story cluster. Two texts whose word-bigram sets have an
+# estimated Jaccard similarity of at least JACCARD_THRESHOLD belong to the
+# same cluster.
+#
+# Lookups are sub-linear: the signature is split into BANDS bands of ROWS
+# values and every stored signature is indexed by a hash of each band
+# (locality-sensitive hashing). Only fingerprints sharing a whole band with the
+# new one are compared; pairs above ~0.75 similarity share one almost surely.
+
+DEFAULT_PATH = os.environ.get("NEWSTREND_DUPLICATE_INDEX", os.path.join(os.getcwd(), "duplicates.sqlite3"))
+
+JACCARD_THRESHOLD = 0.6
+BANDS = 16
+ROWS = 4
+SHINGLE_WORDS = 2
+
+# Universal hash functions (a * x + b) mod p standing in for random permutations;
+# seeded, so signatures stay comparable across runs. With p below 2**32 every
+# a * x + b fits in 64 bits, so a whole signature is one numpy expression.
+_PRIME = (1 << 32) - 5
+_random = random.Random(1729)
+_A, _B = np.array([[_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)] for _ in range(BANDS * ROWS)],
+                  dtype=np.uint64).T.reshape(2, -1, 1)
+
+# Bumped when signatures change; band entries of older signatures are dropped
+# on opening (their documents keep their clusters but no longer match new ones)
+SIGNATURE_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    doc_key TEXT PRIMARY KEY,
+    signature BLOB NOT NULL,
+    cluster TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    doc_key TEXT NOT NULL,
+    PRIMARY KEY (band, value, doc_key)
+);
+"""
+
+_WORD = re.compile(r"\w+")
+_SIGNATURE = struct.Struct(f"<{BANDS * ROWS}Q")
+
+def shingles(text):
+    # Word bigrams (single words for one-word texts)
+    words = _WORD.findall(text.lower())
+    size = SHINGLE_WORDS if len(words) >= SHINGLE_WORDS else 1
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash(text):
+    values = np.fromiter((int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+                          for shingle in shingles(text)), dtype=np.uint64)
+    if not values.size:
+        values = np.zeros(1, dtype=np.uint64)
+    return ((_A * (values % np.uint64(_PRIME)) + _B) % np.uint64(_PRIME)).min(axis=1).tolist()
+
+def similarity(signature, other):
+    # Estimated Jaccard similarity of the two texts' shingle sets
+    return sum(x == y for x, y in zip(signature, other)) / len(signature)
+
+def _bands(signature):
+    return [(band, hashlib.blake2b(_SIGNATURE.pack(*signature)[band * ROWS * 8:(band + 1) * ROWS * 8],
+                                   digest_size=8).digest())
+            for band in range(BANDS)]
+
+class NearDuplicateIndex:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        with self._connection:
+            if self._connection.execute("PRAGMA user_version").fetchone()[0] < SIGNATURE_VERSION:
+                self._connection.execute("DELETE FROM bands")
+                self._connection.execute(f"PRAGMA user_version = {SIGNATURE_VERSION}")
+
+    def _cluster_of(self, signature, bands):
+        # Cluster of the most similar stored near-duplicate, or None
+        best = None
+        seen = set()
+        for band, value in bands:
+            rows = self._connection.execute(
+                "SELECT f.doc_key, f.signature, f.cluster FROM bands b JOIN fingerprints f ON f.doc_key = b.doc_key "
+                "WHERE b.band = ? AND b.value = ?", (band, value)).fetchall()
+            for doc_key, stored, cluster in rows:
+                if doc_key in seen:
+                    continue
+                seen.add(doc_key)
+                score = similarity(signature, _SIGNATURE.unpack(stored))
+                if score >= JACCARD_THRESHOLD and (best is None or score > best[0]):
+                    best = (score, cluster)
+        return best[1] if best else None
+
+    def _known(self, doc_keys):
+        known = {}
+        for i in range(0, len(doc_keys), 500):
+            chunk = doc_keys[i:i + 500]
+            known.update(self._connection.execute(
+                f"SELECT doc_key, cluster FROM fingerprints WHERE doc_key IN ({', '.join('?' * len(chunk))})",
+                chunk).fetchall())
+        return known
+
+    def assign(self, documents):
+        # Story cluster of each (doc_key, text), in order. Known doc_keys keep
+        # their cluster; new ones join their nearest near-duplicate's cluster,
+        # or start one named after themselves, and are stored. Signatures are
+        # computed before the write transaction, which only does the lookups.
+        documents = list(documents)
+        with self._lock:
+            known = self._known([doc_key for doc_key, text in documents])
+        signatures = {doc_key: minhash(text) for doc_key, text in documents if doc_key not in known}
+        clusters = []
+        now = time.time()
+        with self._lock, self._connection:
+            # Another process may have stored some of them meanwhile
+            known.update(self._known(list(signatures)))
+            for doc_key, text in documents:
+                if doc_key in known:
+                    clusters.append(known[doc_key])
+                    continue
+                signature = signatures[doc_key]
+                bands = _bands(signature)
+                cluster = self._cluster_of(signature, bands) or doc_key
+                self._connection.execute(
+                    "INSERT INTO fingerprints (doc_key, signature, cluster, first_seen) VALUES (?, ?, ?, ?)",
+                    (doc_key, _SIGNATURE.pack(*signature), cluster, now))
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO bands (band, value, doc_key) VALUES (?, ?, ?)",
+                    [(band, value, doc_key) for band, value in bands])
+                known[doc_key] = cluster
+                clusters.append(cluster)
+        return clusters
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_duplicate_index():
+    # One index per process, opened on first use
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NearDuplicateIndex()
+    return _index
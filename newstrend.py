@@ -1,57 +1,87 @@
+import os
+import threading
+import time
+_import_started = time.perf_counter()
 import streamlit as st
-import requests
-import nltk
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from streamlit_echarts import st_echarts
 import pandas as pd
-import boto3
-from datetime import datetime
-from collections import Counter
-from io import StringIO, BytesIO
-from GoogleNews import GoogleNews
-import altair as alt
-import os
+from io import BytesIO
+from datetime import date, timedelta
+from pipeline import CUSTOM_STOPWORDS_URL, fetch_custom_stopwords, analyze_keyword, analyze_keywords
+from profiles import load_profiles
+from rollups import rollups_from_results
+from storage import make_history_store, empty_history
+from trends import (TREND_COLUMNS, MAX_COMPARISON_KEYWORDS, materialize_trends, keyword_trend, downsample_trend,
+                    comparison_trends)
+from wordclouds import wordcloud_png
+from resources import lazy_import, timings
+from http_client import provider_stats
+import instrumentation
+from instrumentation import keyword_scope, record_run, stage, timed_stage
+
+timings.setdefault("import newstrend", time.perf_counter() - _import_started)
 
-# Set NLTK data directory
-nltk_data_dir = os.path.join(os.getcwd(), 'nltk_data')
-nltk.data.path.append(nltk_data_dir)
+# How long history reads are cached before the page picks up a newer ingestion run
+S3_CACHE_TTL = 600
 
-# Download necessary NLTK data and models
-nltk.download("punkt", download_dir=nltk_data_dir, quiet=True)
-nltk.download("vader_lexicon", download_dir=nltk_data_dir, quiet=True)
-nltk.download("stopwords", download_dir=nltk_data_dir, quiet=True)
-from nltk.corpus import stopwords
+# Live per-keyword results are reused for every rerun and session within the
+# same time bucket (one hour by default)
+RESULT_BUCKET_SECONDS = int(os.environ.get("NEWSTREND_RESULT_BUCKET", 3600))
 
-# Initialize GoogleNews
-googlenews = GoogleNews()
+# Trend chart periods offered in the sidebar (days back; None for the whole history)
+TREND_PERIODS = {"30 days": 30, "90 days": 90, "1 year": 365, "All": None}
+DEFAULT_TREND_PERIOD = "1 year"
 
-# Keywords for analysis
-KEYWORDS = ['Troy University', 'University of South Alabama', 'Jacksonville State University',
-            'University of Alabama', 'Auburn University', 'Columbus State University']
+# Profiles with more keywords than this open in the single-keyword layout
+FULL_PAGE_MAX_KEYWORDS = 10
+ARTICLES_PER_PAGE = 10
 
-@st.cache_data
 def get_custom_stopwords(url):
+    # Loaded from the local copy (see resources.py) after the first download
     try:
-        response = requests.get(url)
-        stopwords = set(response.text.split())
-        return stopwords
+        return fetch_custom_stopwords(url)
     except Exception as e:
         st.error(f"Failed to fetch custom stopwords: {e}")
         return set()
 
-def plot_wordcloud(words):
-    custom_stopwords_url = "https://github.com/aneesha/RAKE/raw/master/SmartStoplist.txt"
-    custom_stopwords = get_custom_stopwords(custom_stopwords_url)
-    wordcloud = WordCloud(width=800, height=800,
-                          background_color='white',
-                          stopwords=custom_stopwords,
-                          min_font_size=10).generate(' '.join(words))
-    fig, ax = plt.subplots(figsize=(8, 8))
-    ax.imshow(wordcloud)
-    ax.axis("off")
-    st.pyplot(fig)
+def time_bucket():
+    return int(time.time() // RESULT_BUCKET_SECONDS)
+
+class UncachedResult(Exception):
+    # Carries a failed keyword result out of analyze_keyword_cached;
+    # st.cache_data does not cache exceptions, so the next rerun retries
+    pass
+
+@st.cache_data(ttl=2 * RESULT_BUCKET_SECONDS, show_spinner=False)
+def analyze_keyword_cached(keyword, bucket, custom_stopwords):
+    # Articles, token counts, sentiment and topics of one keyword, memoized per time bucket
+    result = analyze_keyword(keyword, custom_stopwords)
+    if result["error"]:
+        raise UncachedResult(result)
+    return result
 
+def analyze_keywords_cached(keywords, custom_stopwords):
+    # The worker threads get this script run's context so st.cache_data works in them
+    bucket = time_bucket()
+    ctx = get_script_run_ctx()
+
+    def analyze(keyword, stopwords):
+        try:
+            return analyze_keyword_cached(keyword, bucket, stopwords)
+        except UncachedResult as e:
+            return e.args[0]
+
+    return analyze_keywords(keywords, custom_stopwords, analyze=analyze,
+                            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx))
+
+@timed_stage("wordcloud")
+def plot_wordcloud(keyword, word_counts):
+    # Stopwords are already removed from word_counts by pipeline.analyze_texts;
+    # the PNG is cached, so reruns for an unchanged keyword don't rasterize again
+    st.image(wordcloud_png(keyword, word_counts))
+
+@timed_stage("gauge")
 def render_sentiment_gauge(score):
     color = '#6DD400' if score > 0 else '#FFD93D' if score == 0 else '#FF4500'
     options = {
@@ -91,58 +121,160 @@ def render_sentiment_gauge(score):
     }
     st_echarts(options=options, height="400px")
 
-def analyze_sentiment(text):
-    from nltk.sentiment.vader import SentimentIntensityAnalyzer
-    sid = SentimentIntensityAnalyzer()
-    sentiment = sid.polarity_scores(text)
-    sentiment_score = sentiment['compound'] * 100
-    return sentiment_score
-
-def fetch_news(keyword):
-    try:
-        googlenews.clear()
-        googlenews.search(keyword)
-        result = googlenews.result()
-        if not result:
-            st.error(f"No results found for {keyword}. This could be due to reaching the API limit or no news articles being available.")
-            return []
-        return result
-    except Exception as e:
-        st.error(f"Failed to fetch news for {keyword}: {e}")
-        return []
-
-@st.cache_data
-def load_historical_data(bucket, object_key):
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=st.secrets["aws"]["aws_access_key_id"],
-        aws_secret_access_key=st.secrets["aws"]["aws_secret_access_key"]
+def get_history_store(history_key=None):
+    # Setting aws.history_uri switches from the single CSV object to the Parquet store,
+    # and aws.delta_log to the delta log, which concurrent sessions can save to safely;
+    # history_key selects a profile's own history (see profiles.py)
+    aws = st.secrets["aws"]
+    return make_history_store(
+        history_uri=aws.get("history_uri"),
+        bucket=aws.get("bucket_name"),
+        object_key=aws.get("object_key"),
+        partition_by_keyword=aws.get("partition_by_keyword", False),
+        aws_access_key_id=aws["aws_access_key_id"],
+        aws_secret_access_key=aws["aws_secret_access_key"],
+        region=aws.get("region"),
+        history_key=history_key,
+        delta_log=aws.get("delta_log", False)
     )
+
+@timed_stage("load_history")
+@st.cache_data(ttl=S3_CACHE_TTL)
+def load_historical_data(history_key=None, keywords=None, start=None, end=None, columns=None):
+    # Only the matching rows and columns are read (see storage.py); keywords
+    # and columns should be tuples so they are hashable cache keys
     try:
-        response = s3.get_object(Bucket=bucket, Key=object_key)
-        historical_data = pd.read_csv(response['Body'])
-        historical_data['Date'] = pd.to_datetime(historical_data['Date'], errors='coerce').dt.date
-        return historical_data
+        return get_history_store(history_key).read(keywords=keywords, start=start, end=end, columns=columns)
     except Exception as e:
         st.write(f"Could not load historical data from S3. Error: {e}")
-        return pd.DataFrame(columns=["Date", "Keyword", "Topics", "Sentiment"])
+        return empty_history() if columns is None else pd.DataFrame(columns=list(columns))
 
-def upload_csv_to_s3(df, bucket, object_key):
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=st.secrets["aws"]["aws_access_key_id"],
-        aws_secret_access_key=st.secrets["aws"]["aws_secret_access_key"]
-    )
+@timed_stage("load_latest")
+@st.cache_data(ttl=S3_CACHE_TTL)
+def load_latest_results(history_key=None):
+    # Snapshot written by ingest.py; None when no ingestion run has happened yet
     try:
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_buffer.seek(0)
-        s3.put_object(Bucket=bucket, Key=object_key, Body=csv_buffer.getvalue())
-        st.write(f"Data uploaded to S3 bucket `{bucket}` at `{object_key}`.")
+        return get_history_store(history_key).read_latest()
+    except Exception:
+        return None
+
+def upload_history(results, day, history_key=None):
+    # The articles are folded into the day's rows as currently stored (not the
+    # cached copy this session started from), so nothing is counted twice
+    try:
+        with record_run("upload", enabled=instrumentation.ENABLED), stage("upload_history"):
+            store = get_history_store(history_key)
+            store.upsert(rollups_from_results(results, day, store.read(start=day, end=day)))
+        st.write(f"Data uploaded to `{store!r}`.")
     except Exception as e:
         st.error(f"Failed to upload data to S3: {e}")
 
+def render_articles(keyword, articles):
+    # One page of the keyword's articles at a time
+    pages = max(1, -(-len(articles) // ARTICLES_PER_PAGE))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                               key=f"articles-page-{keyword}")
+    for article in articles[(page - 1) * ARTICLES_PER_PAGE:page * ARTICLES_PER_PAGE]:
+        copies = f"\n\n_{article['duplicates']} similar article(s) not shown_" if article.get("duplicates") else ""
+        st.markdown(f"#### [{article['title']}]({article['url']})\n\n*{article['description']}*{copies}\n\n---")
+
+def render_keyword(result, sentiment_trends, rolling_trends):
+    with keyword_scope(result["keyword"]):
+        _render_keyword(result, sentiment_trends, rolling_trends)
+
+def _render_keyword(result, sentiment_trends, rolling_trends):
+    keyword = result["keyword"]
+    st.header(f"Keyword: {keyword}")
+
+    if result["error"]:
+        st.error(result["error"])
+    if not result["articles"]:
+        st.error(f"No results found for {keyword}.")
+        return
+
+    # Display news links
+    with stage("articles"):
+        render_articles(keyword, result["articles"])
+
+    if "sentiment" not in result:
+        return
+
+    # Display word cloud
+    if result.get("word_counts"):
+        st.write("Aggregate Word Cloud:")
+        plot_wordcloud(keyword, result["word_counts"])
+
+    st.write("Aggregate Sentiment:")
+    render_sentiment_gauge(round(result["sentiment"], 1))
+    stats = result.get("sentiment_stats")
+    if stats:
+        st.caption(f"{stats['count']} articles: mean {stats['mean']:.1f}, median {stats['median']:.1f}, "
+                   f"stdev {stats['stdev']:.1f}; {stats['positive']} positive, {stats['negative']} negative")
+
+    # Process the data for sentiment trend chart; long periods are shown as
+    # weekly/monthly means so the chart stays under a fixed number of points
+    keyword_data = downsample_trend(keyword_trend(sentiment_trends, rolling_trends, keyword))
+
+    # Display sentiment trend chart
+    if not keyword_data.empty:
+        with stage("trend_chart"):
+            alt = lazy_import("altair")
+            st.subheader(f"Sentiment Trend for \"{keyword}\":")
+            base = alt.Chart(keyword_data).encode(x=alt.X('Date:T', axis=alt.Axis(title='Date')))
+            point_chart = base.mark_point().encode(
+                y=alt.Y('Sentiment:Q', axis=alt.Axis(title='Sentiment Score')),
+                tooltip=['Date:T', 'Sentiment:Q', 'Rolling Mean:Q']
+            )
+            rolling_line = base.mark_line(color='#888888').encode(y='Rolling Mean:Q')
+            st.altair_chart((point_chart + rolling_line).properties(width=700, height=400).interactive())
+
+def summary_table(results):
+    # One row per keyword, rendered as a single dataframe element
+    return pd.DataFrame([{
+        "Keyword": result["keyword"],
+        "Articles": len(result["articles"]),
+        "Sentiment": round(result["sentiment"], 1) if "sentiment" in result else None,
+        "Topics": result.get("topics", ""),
+        "Error": result["error"] or "",
+    } for result in results])
+
+@timed_stage("comparison_chart")
+def render_comparison_chart(rolling_trends, keywords):
+    # Rolling means of every school on one chart, downsampled to a fixed point budget
+    data = comparison_trends(rolling_trends, keywords)
+    if data.empty:
+        return
+    st.subheader("Sentiment Trends by School")
+    alt = lazy_import("altair")
+    chart = alt.Chart(data).mark_line().encode(
+        x=alt.X('Date:T', axis=alt.Axis(title='Date')),
+        y=alt.Y('Rolling Mean:Q', axis=alt.Axis(title='Sentiment Score (rolling mean)')),
+        color=alt.Color('Keyword:N', title='School'),
+        tooltip=['Date:T', 'Keyword:N', alt.Tooltip('Rolling Mean:Q', format='.1f')]
+    ).properties(width=700, height=400).interactive()
+    st.altair_chart(chart)
+
+def render_debug_panel(run):
+    # Where the time of this rerun went, overall and per keyword
+    with st.sidebar.expander("Debug timings", expanded=True):
+        summary = pd.DataFrame.from_dict(run.summary(), orient="index").sort_values("total", ascending=False)
+        st.dataframe(summary.round(4))
+        by_keyword = pd.DataFrame.from_dict(run.by_keyword(), orient="index")
+        if not by_keyword.empty:
+            st.dataframe(by_keyword.round(4))
+
 def main():
+    # Stage timings are collected when NEWSTREND_TIMINGS is set (and then
+    # exported, see instrumentation.py) or the debug panel is switched on
+    debug = st.sidebar.checkbox("Debug timings", value=False)
+    with record_run("page", enabled=debug or instrumentation.ENABLED) as run:
+        render_page()
+    if run and debug:
+        render_debug_panel(run)
+
+def render_page():
     hide_button_css = """
             <style>
             .st-emotion-cache-ztfqz8.ef3psqc5 {
@@ -153,90 +285,102 @@ def main():
 
     st.markdown(hide_button_css, unsafe_allow_html=True)
 
+    # Each profile (peer group) has its own keywords and history; keywords
+    # shared between profiles hit the same per-keyword cache entries
+    profiles, default_profile = load_profiles()
+    names = list(profiles)
+    profile = profiles[st.sidebar.selectbox("Profile", names, index=names.index(default_profile),
+                                            format_func=lambda name: profiles[name]["title"])]
+    history_key = profile["history_key"]
+
     st.title("News Feed Analyzer")
+    st.caption(profile["title"])
+
+    # Render the precomputed results of the last ingest.py run when there is one;
+    # otherwise fall back to fetching and analyzing every keyword in this session.
+    snapshot = load_latest_results(history_key)
+    live = snapshot is None
+    if live:
+        # Stopwords are resolved here so a failure can be reported on the page
+        custom_stopwords = frozenset(get_custom_stopwords(CUSTOM_STOPWORDS_URL))
+        with stage("analyze_keywords"):
+            results = analyze_keywords_cached(profile["keywords"], custom_stopwords)
+        # Today's stored rows are merged with the live results into the rows
+        # the upload button would write, and shown as today's trend points
+        today = date.today()
+        new_rows = rollups_from_results(results, today, load_historical_data(history_key, start=today, end=today))
+    else:
+        results = snapshot["results"]
+        new_rows = None
+        st.caption(f"Results from the ingestion run at {snapshot['generated_at']}.")
+
+    current_sentiments = [{"Keyword": result["keyword"], "Sentiment": result["sentiment"]}
+                          for result in results if "sentiment" in result]
+
+    # Large keyword sets default to rendering one selected keyword in full,
+    # with a summary table for the rest, so a rerun's size doesn't grow with them
+    layouts = ["Selected keyword", "All keywords"]
+    layout = st.sidebar.radio("Layout", layouts, index=0 if len(results) > FULL_PAGE_MAX_KEYWORDS else 1)
+    period = st.sidebar.selectbox("Trend period", list(TREND_PERIODS), index=list(TREND_PERIODS).index(DEFAULT_TREND_PERIOD))
+    days = TREND_PERIODS[period]
+    start = date.today() - timedelta(days=days - 1) if days else None
+    if layout == "Selected keyword":
+        st.subheader("Summary")
+        st.dataframe(summary_table(results), hide_index=True, use_container_width=True)
+        keywords = [result["keyword"] for result in results]
+        selected = st.selectbox("Keyword", keywords)
+        shown = [results[keywords.index(selected)]]
+    else:
+        shown = results
+    compare = st.sidebar.checkbox("School comparison chart", value=layout == "All keywords")
+    compared = []
+    if compare:
+        # At most MAX_COMPARISON_KEYWORDS lines, so the chart stays readable and within its point budget
+        all_keywords = [result["keyword"] for result in results]
+        compared = st.sidebar.multiselect("Schools to compare", all_keywords,
+                                          default=all_keywords[:MAX_COMPARISON_KEYWORDS],
+                                          max_selections=MAX_COMPARISON_KEYWORDS)
+
+    # Trend charts only read the rows they show: the shown and compared
+    # keywords' Date and Sentiment over the chosen period, pivoted once into
+    # every keyword's trend
+    trend_keywords = list(dict.fromkeys([result["keyword"] for result in shown] + compared))
+    trend_data = load_historical_data(history_key, keywords=tuple(trend_keywords),
+                                      start=start, columns=tuple(TREND_COLUMNS))
+    if new_rows is not None:
+        # The live rows come last, so they win over stored rows of the same day
+        trend_data = pd.concat([trend_data, new_rows[TREND_COLUMNS]], ignore_index=True)
+    with stage("materialize_trends"):
+        sentiment_trends, rolling_trends = materialize_trends(trend_data)
+    for result in shown:
+        render_keyword(result, sentiment_trends, rolling_trends)
+
+    if compared:
+        render_comparison_chart(rolling_trends, compared)
+
+    # Update S3 with the combined data after processing all keywords;
+    # ingestion runs have already stored their rows. The callback receives the
+    # results rendered in this run, so exactly what the user saw is saved, and
+    # it runs before the (cached, and so cheap) rerun the click triggers.
+    if live:
+        st.button("Update All Data to S3", on_click=upload_history, args=(results, today, history_key))
+
+    # Time spent on imports and resource loading in this server process
+    with st.sidebar.expander("Startup timing"):
+        for name, seconds in sorted(timings.items()):
+            st.write(f"{name}: {seconds:.3f}s")
 
-    # Load historical data from S3
-    historical_data = load_historical_data(st.secrets["aws"]["bucket_name"], st.secrets["aws"]["object_key"])
-    combined_data = historical_data.copy()
-    current_sentiments = []
-
-    for keyword in KEYWORDS:
-        st.header(f"Keyword: {keyword}")
-
-        # Fetch news articles for the keyword
-        articles = fetch_news(keyword)
-        if not articles:
-            st.error(f"No results found for {keyword}.")
-            continue
-
-        # Display news links
-        news_text = ""
-        for article in articles:
-            title = article['title']
-            description = article['desc']
-            url = article['link']
-            if not url.startswith("http"):
-                url = "https://news.google.com" + url  # Ensure the URL is correct
-            news_text += f"{title} {description} "
-            st.markdown(f"#### [{title}]({url})")
-            st.markdown(f"*{description}*")
-            st.markdown("---")
-
-        # Generate and display word cloud
-        if news_text:
-            st.write("Aggregate Word Cloud:")
-            plot_wordcloud(nltk.word_tokenize(news_text.lower()))
-
-            # Analyze sentiment
-            sentiment_score = analyze_sentiment(news_text)
-            st.write("Aggregate Sentiment:")
-            render_sentiment_gauge(sentiment_score)
-
-            # Update historical data
-            update_df = pd.DataFrame({
-                "Date": [datetime.now().strftime("%Y-%m-%d")],
-                "Keyword": [keyword],
-                "Topics": [', '.join(word for word, count in Counter([word for word in nltk.word_tokenize(news_text.lower()) if word.isalpha() and word not in get_custom_stopwords("https://github.com/aneesha/RAKE/raw/master/SmartStoplist.txt")]).most_common(5))],
-                "Sentiment": [sentiment_score]
-            })
-
-            combined_data = pd.concat([combined_data, update_df])
-
-            current_sentiments.append({
-                "Keyword": keyword,
-                "Sentiment": sentiment_score
-            })
-
-            # Process the data for sentiment trend chart
-            keyword_data = combined_data[combined_data['Keyword'] == keyword].copy()
-            keyword_data['Date'] = pd.to_datetime(keyword_data['Date'], errors='coerce').dt.date
-            keyword_data = keyword_data.dropna(subset=['Date'])
-            keyword_data = keyword_data.sort_values('Date')
-
-            # Ensure each day has a sentiment score
-            date_range = pd.date_range(start=keyword_data['Date'].min(), end=keyword_data['Date'].max())
-            keyword_data = keyword_data.set_index('Date').reindex(date_range).fillna(method='ffill').reset_index()
-            keyword_data.columns = ['Date', 'Keyword', 'Topics', 'Sentiment']
-
-            # Display sentiment trend chart
-            if not keyword_data.empty:
-                st.subheader(f"Sentiment Trend for \"{keyword}\":")
-                point_chart = alt.Chart(keyword_data).mark_point().encode(
-                    x=alt.X('Date:T', axis=alt.Axis(title='Date')),
-                    y=alt.Y('Sentiment:Q', axis=alt.Axis(title='Sentiment Score')),
-                    tooltip=['Date:T', 'Sentiment:Q']
-                ).properties(width=700, height=400).interactive()
-                st.altair_chart(point_chart)
-
-    # Update S3 with the combined data after processing all keywords
-    if st.button("Update All Data to S3"):
-        upload_csv_to_s3(combined_data, st.secrets["aws"]["bucket_name"], st.secrets["aws"]["object_key"])
+    # Requests made by this server process, per provider (see http_client.py)
+    stats = provider_stats()
+    if stats:
+        with st.sidebar.expander("Network"):
+            st.dataframe(pd.DataFrame.from_dict(stats, orient="index"))
 
     # Display current sentiment column chart
     if current_sentiments:
         st.subheader("Current Sentiment of Each School")
         sentiment_df = pd.DataFrame(current_sentiments)
-        
+        alt = lazy_import("altair")
         column_chart = alt.Chart(sentiment_df).mark_bar().encode(
             x=alt.X('Keyword', sort=None, axis=alt.Axis(title='School')),
             y=alt.Y('Sentiment', axis=alt.Axis(title='Sentiment Score')),
@@ -0,0 +1,231 @@
+import contextvars
+import os
+import sqlite3
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from resources import SMART_STOPLIST_URL, lazy_import, load_stoplist, word_tokenize
+from sentiment import score_batch
+from fetch_cache import get_fetch_cache, fetch_pages, pages_for, url_key
+from http_client import call
+from article_bodies import FETCH_BODIES, body_batch, fetch_bodies
+from near_duplicates import get_duplicate_index
+from instrumentation import keyword_scope, stage, timed_stage
+from keyphrases import candidate_phrases, get_df_index, rank_keyphrases
+from rollups import TOPIC_COUNT
+
+# Fetching and analysis shared by the Streamlit page (newstrend.py) and the
+# headless ingestion runner (ingest.py). Nothing in here may call st.*.
+
+# NLTK, GoogleNews and their data are loaded on first use (see resources.py),
+# so importing this module stays cheap for pages that only render stored results.
+
+# Keywords for analysis
+KEYWORDS = ['Troy University', 'University of South Alabama', 'Jacksonville State University',
+            'University of Alabama', 'Auburn University', 'Columbus State University']
+
+CUSTOM_STOPWORDS_URL = SMART_STOPLIST_URL
+
+# Upper bound on keywords fetched and analyzed at the same time
+MAX_WORKERS = 8
+
+# Search depth: result pages fetched per keyword (GoogleNews returns about
+# GOOGLE_NEWS_PAGE_SIZE articles a page), and how many days back to search
+# (0 for no date range). Pages of a keyword are fetched concurrently.
+FETCH_PAGES = int(os.environ.get("NEWSTREND_FETCH_PAGES", 1))
+FETCH_DAYS = int(os.environ.get("NEWSTREND_FETCH_DAYS", 0))
+GOOGLE_NEWS_PAGE_SIZE = 10
+
+def fetch_custom_stopwords(url):
+    # Local cached copy when there is one; downloaded (and cached) otherwise
+    return load_stoplist(url)
+
+def analyze_texts(texts, custom_stopwords, doc_keys=None, exclude=()):
+    # The single analysis stage: every text is tokenized once; the word cloud
+    # and daily rollups use its word Counter, the topics its RAKE phrases
+    # ranked against the corpus (see keyphrases.py), which the texts join when
+    # doc_keys (one stable key per text, e.g. from the URL) are given.
+    # Sentiment is scored per text and summarized; "sentiment" is the mean.
+    # custom_stopwords should be a frozenset resolved once per run.
+    with stage("tokenize"):
+        tokens = [word_tokenize(text.lower()) for text in texts]
+        text_counts = [Counter(word for word in words if word.isalpha() and word not in custom_stopwords)
+                       for words in tokens]
+        word_counts = Counter()
+        for counts in text_counts:
+            word_counts.update(counts)
+    with stage("keyphrases"):
+        text_phrases = [candidate_phrases(words, custom_stopwords) for words in tokens]
+        index = get_df_index()
+        if doc_keys is not None:
+            index.add(dict(zip(doc_keys, text_phrases)))
+        topics = ', '.join(rank_keyphrases(text_phrases, index, exclude=exclude, n=TOPIC_COUNT))
+    with stage("sentiment"):
+        scores, stats = score_batch(texts)
+    return {
+        "word_counts": dict(word_counts),
+        "text_word_counts": [dict(counts) for counts in text_counts],
+        "topics": topics,
+        "scores": scores,
+        "sentiment": stats["mean"],
+        "sentiment_stats": stats,
+    }
+
+def time_window(days, today=None):
+    # (start, end) dates covering the last `days` days, or None for no range
+    if not days:
+        return None
+    today = today or date.today()
+    return today - timedelta(days=days - 1), today
+
+def window_key(pages=1, window=None):
+    # Fetch cache key part for a search depth; "" for the original single-page search
+    if pages == 1 and window is None:
+        return ""
+    key = f"pages={pages}"
+    if window is not None:
+        key += f";{window[0].isoformat()}..{window[1].isoformat()}"
+    return key
+
+# search_google_news sets GoogleNews' private _GoogleNews__key, which only the
+# 1.6 releases are known to read in get_page; requirements.txt pins one of them
+GOOGLENEWS_VERSIONS = ("1.6.",)
+
+_googlenews_checked = False
+
+def check_googlenews_version():
+    global _googlenews_checked
+    if not _googlenews_checked:
+        from importlib.metadata import version
+        installed = version("GoogleNews")
+        if not installed.startswith(GOOGLENEWS_VERSIONS):
+            raise RuntimeError(f"GoogleNews {installed} is not supported (need {', '.join(GOOGLENEWS_VERSIONS)}x): "
+                               "search_google_news depends on its private page key")
+        _googlenews_checked = True
+
+def search_google_news(keyword, page=1, window=None):
+    # GoogleNews keeps its results on the instance, so every call gets its own
+    # client to stay safe when keywords and pages are fetched from several threads.
+    # It does its own HTTP, so only the rate limit and retries of http_client apply.
+    check_googlenews_version()
+    start, end = (day.strftime("%m/%d/%Y") for day in window) if window else ("", "")
+
+    def search():
+        googlenews = lazy_import("GoogleNews").GoogleNews(start=start, end=end)
+        # By default GoogleNews prints request and parse errors and returns no
+        # results; raised instead, they reach call(), which retries and counts them
+        googlenews.enableException(True)
+        # Every page, the first included, comes from get_page (Google search's
+        # news tab, GOOGLE_NEWS_PAGE_SIZE results at offset 10 * (page - 1)).
+        # search() would scrape news.google.com instead, a different source
+        # that doesn't page. get_page reads the query from the private key
+        # search() stores, so it is set directly (see check_googlenews_version).
+        googlenews._GoogleNews__key = urllib.parse.quote(keyword.encode("utf-8"))
+        googlenews.get_page(page)
+        return googlenews.result()
+
+    return call("googlenews", search)
+
+@timed_stage("fetch_news")
+def fetch_news(keyword, cache=None, pages=None, window=None):
+    # Results are served from the on-disk fetch cache while fresh, de-duplicated by URL.
+    # Errors are returned rather than shown, as worker threads cannot write to the page.
+    cache = cache or get_fetch_cache()
+    pages = pages or FETCH_PAGES
+    try:
+        result = cache.fetch("googlenews", keyword,
+                             lambda: fetch_pages(lambda page: search_google_news(keyword, page, window), pages, url_field="link"),
+                             url_field="link", time_window=window_key(pages, window))
+        if not result:
+            return [], f"No results found for {keyword}. This could be due to reaching the API limit or no news articles being available."
+        return result, None
+    except Exception as e:
+        return [], f"Failed to fetch news for {keyword}: {e}"
+
+def search_depth(pages=None, target_articles=None, days=None):
+    # fetch_news arguments for a depth given as pages or a target article count
+    if target_articles:
+        pages = pages_for(target_articles, GOOGLE_NEWS_PAGE_SIZE)
+    return {"pages": pages or FETCH_PAGES, "window": time_window(FETCH_DAYS if days is None else days)}
+
+def analyze_keyword(keyword, custom_stopwords, pages=None, window=None, bodies=None):
+    # Fetch and analyze a single keyword. The result only holds plain
+    # lists/dicts/numbers so it can be stored as JSON by the ingestion runner.
+    # Without an explicit window the FETCH_DAYS default applies; `bodies`
+    # (default FETCH_BODIES) adds each article's page text to the analysis.
+    articles, error = fetch_news(keyword, pages=pages, window=window or time_window(FETCH_DAYS))
+    result = {"keyword": keyword, "articles": [], "error": error}
+    if not articles:
+        return result
+
+    texts = []
+    for article in articles:
+        title = article['title']
+        description = article['desc']
+        url = article['link']
+        if not url.startswith("http"):
+            url = "https://news.google.com" + url  # Ensure the URL is correct
+        texts.append(f"{title} {description}")
+        result["articles"].append({"title": title, "description": description, "url": url})
+
+    if FETCH_BODIES if bodies is None else bodies:
+        # Best effort: articles whose page couldn't be fetched keep their snippet only
+        try:
+            with stage("fetch_bodies"):
+                page_text = fetch_bodies([article["url"] for article in result["articles"]])
+        except Exception:
+            page_text = {}
+        texts = [f"{text} {page_text[article['url']]}" if page_text.get(article["url"]) else text
+                 for text, article in zip(texts, result["articles"])]
+
+    # The duplicate and keyphrase indexes are shared SQLite files; if one
+    # can't be used (locked past its timeout, disk full) only this keyword
+    # fails, like a failed fetch, and the others still land
+    try:
+        # Near-duplicates (syndicated copies of one story, see near_duplicates.py)
+        # are analyzed and counted once: the first article of each story cluster
+        # stands for it and records how many copies were dropped
+        with stage("dedupe"):
+            clusters = get_duplicate_index().assign(
+                [(url_key(article["url"]), text) for article, text in zip(result["articles"], texts)])
+        stories = {}
+        for article, text, cluster in zip(result["articles"], texts, clusters):
+            if cluster in stories:
+                stories[cluster][0]["duplicates"] += 1
+                continue
+            article["story"] = cluster
+            article["duplicates"] = 0
+            stories[cluster] = (article, text)
+        result["articles"] = [article for article, text in stories.values()]
+        texts = [text for article, text in stories.values()]
+
+        if texts:
+            result.update(analyze_texts(texts, custom_stopwords, doc_keys=list(stories),
+                                        exclude=keyword.lower().split()))
+            # Per-article values let the daily rollups absorb each story exactly once
+            for article, score, word_counts in zip(result["articles"], result.pop("scores"), result.pop("text_word_counts")):
+                article["sentiment"] = score
+                article["word_counts"] = word_counts
+    except sqlite3.Error as e:
+        return {"keyword": keyword, "articles": [], "error": f"Failed to analyze {keyword}: {e}"}
+    return result
+
+def analyze_keywords(keywords, custom_stopwords, max_workers=MAX_WORKERS, analyze=None, initializer=None, bodies=None):
+    # Results come back in the order of `keywords`, whatever order the workers finish in.
+    # `analyze` replaces analyze_keyword (e.g. with a memoized wrapper) and
+    # `initializer` runs in each worker thread before its first keyword.
+    # Each keyword runs in a copy of the caller's context, so its stage
+    # timings land in the caller's run (see instrumentation.py), and its
+    # article pages are downloaded in the refresh's shared body batch.
+    analyze = analyze or analyze_keyword
+    custom_stopwords = frozenset(custom_stopwords)
+
+    def run(keyword):
+        with keyword_scope(keyword):
+            return analyze(keyword, custom_stopwords)
+
+    with body_batch(FETCH_BODIES if bodies is None else bodies), \
+            ThreadPoolExecutor(max_workers=min(max_workers, max(len(keywords), 1)), initializer=initializer) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, run, keyword) for keyword in keywords]
+        return [future.result() for future in futures]
@@ -0,0 +1,43 @@
+import json
+import os
+from pipeline import KEYWORDS
+
+# Named keyword profiles (peer groups), loaded from profiles.json:
+#
+#   {"default": "alabama",
+#    "profiles": {"alabama": {"title": "...", "keywords": [...], "history_key": "..."}}}
+#
+# history_key gives the profile its own history: <history_key>.csv next to the
+# configured CSV object, or a <history_key> directory next to history_uri for
+# the Parquet store (see storage.make_history_store). Without one the profile
+# uses the configured location itself, which is how the history from before
+# profiles existed stays with the default profile.
+# Keywords shared by several profiles are fetched and analyzed once per refresh.
+
+PROFILES_PATH = os.environ.get("NEWSTREND_PROFILES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles.json"))
+
+DEFAULT_PROFILE = "default"
+
+def load_profiles(path=PROFILES_PATH):
+    # (profiles by name in file order, name of the default profile)
+    if not os.path.exists(path):
+        return {DEFAULT_PROFILE: {"title": "News Feed Analyzer", "keywords": list(KEYWORDS), "history_key": None}}, DEFAULT_PROFILE
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    profiles = {}
+    for name, profile in config["profiles"].items():
+        if not profile.get("keywords"):
+            raise ValueError(f"Profile {name!r} in {path} has no keywords")
+        profiles[name] = {
+            "title": profile.get("title", name),
+            "keywords": list(profile["keywords"]),
+            "history_key": profile.get("history_key"),
+        }
+    default = config.get("default", next(iter(profiles)))
+    if default not in profiles:
+        raise ValueError(f"Default profile {default!r} is not defined in {path}")
+    return profiles, default
+
+def union_keywords(profiles):
+    # Every keyword of the given profiles once, in first-seen order
+    return list(dict.fromkeys(keyword for profile in profiles for keyword in profile["keywords"]))
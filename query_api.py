@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+from profiles import load_profiles
+from storage import make_history_store
+from trends import MAX_CHART_POINTS, materialize_trends, keyword_trend, downsample_trend
+
+# Read-only HTTP query service over the history written by ingest.py, for
+# dashboards that need the numbers without the Streamlit page (which runs the
+# pipeline):
+#
+#   python query_api.py --bucket my-bucket --object-key news/sentiment.csv --port 8502
+#
+#   GET /profiles                                   profile names, titles and keywords
+#   GET /latest?profile=ivy                         latest stored day of each keyword
+#   GET /trend?keyword=Yale University&start=2026-01-01&end=2026-06-30&max_points=200
+#                                                   daily sentiment and rolling mean
+#   GET /topics?keyword=...&start=...&end=...&n=10  most frequent topic words over the range
+#
+# keyword may be repeated (default: every keyword of the profile); profile
+# defaults to the default profile. Responses are JSON ({"generated_at" of the
+# ingestion run, "columns", "rows"}), or an Arrow IPC stream with format=arrow.
+#
+# Nothing is ever fetched or analyzed here. Each profile's history (without
+# the per-article columns) is read once into memory and every distinct
+# response is built once from it. Both are dropped when the store's latest-run
+# snapshot changes, which ingest.py rewrites after every run; that is checked
+# at most every CHECK_INTERVAL seconds, so polling costs one small read per
+# interval at most. Saves made from the Streamlit page don't touch the snapshot
+# and show up once the cached history is MAX_AGE seconds old.
+# Responses carry an ETag, so pollers sending If-None-Match get a 304.
+
+CHECK_INTERVAL = 30
+MAX_AGE = 3600
+MAX_CACHED_RESPONSES = 1024
+
+# History columns the endpoints need; ArticleScores, the bulk of each row, is never read
+API_COLUMNS = ('Date', 'Keyword', 'Sentiment', 'Articles', 'Topics', 'TopicCounts')
+
+TOPIC_LIMIT = 10
+
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+class BadRequest(Exception):
+    pass
+
+class ProfileCache:
+    # One profile's history in memory plus the responses built from it
+
+    def __init__(self, store, check_interval=CHECK_INTERVAL, max_age=MAX_AGE):
+        self.store = store
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.history = None
+        self.version = None
+        self.generated_at = None
+        self._checked = None
+        self._loaded = None
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _snapshot_time(self):
+        try:
+            return self.store.read_latest().get("generated_at")
+        except Exception:
+            return None
+
+    def refresh(self):
+        # Reload when a new ingestion run has finished (or the copy is too
+        # old); concurrent requests wait for one reload instead of each doing it
+        with self._lock:
+            now = time.monotonic()
+            if self._checked is not None and now - self._checked < self.check_interval:
+                return
+            generated_at = self._snapshot_time()
+            if (self.history is not None and generated_at == self.generated_at
+                    and now - self._loaded < self.max_age):
+                self._checked = now
+                return
+            # A failed read raises here and is retried by the next request
+            self.history = self.store.read(columns=API_COLUMNS)
+            self._checked = now
+            self.generated_at = generated_at
+            self.version = uuid.uuid4().hex[:12]
+            self._loaded = now
+            self._responses.clear()
+
+    def response(self, key, build):
+        # The cached (content type, body) for `key`, built with
+        # build(history, generated_at) on a miss; returns (version, response)
+        self.refresh()
+        with self._lock:
+            version, history, generated_at = self.version, self.history, self.generated_at
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                return version, cached
+        built = build(history, generated_at)
+        with self._lock:
+            if self.version == version:
+                self._responses[key] = built
+                if len(self._responses) > MAX_CACHED_RESPONSES:
+                    self._responses.popitem(last=False)
+        return version, built
+
+def _date(params, name):
+    value = params.get(name, [None])[0]
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a date (YYYY-MM-DD), got {value!r}")
+
+def _int(params, name, default, low=1, high=10000):
+    value = params.get(name, [None])[0]
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer, got {value!r}")
+    if not low <= number <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return number
+
+def _in_range(history, keywords, start=None, end=None):
+    mask = history['Keyword'].isin(keywords)
+    if start is not None:
+        mask &= history['Date'] >= start
+    if end is not None:
+        mask &= history['Date'] <= end
+    return history[mask]
+
+def latest_table(history, keywords):
+    # Each keyword's most recent stored day
+    rows = _in_range(history, keywords).sort_values('Date', kind='stable')
+    rows = rows.drop_duplicates(subset=['Keyword'], keep='last')
+    return rows[['Keyword', 'Date', 'Sentiment', 'Articles', 'Topics']].reset_index(drop=True)
+
+def trend_table(history, keywords, start=None, end=None, max_points=MAX_CHART_POINTS):
+    # Daily sentiment and rolling mean per keyword, downsampled like the page's
+    # charts. The rolling mean is computed over the whole history, so the first
+    # days of the range include the days before it.
+    matrix, rolling = materialize_trends(_in_range(history, keywords, end=end))
+    frames = []
+    for keyword in keywords:
+        trend = keyword_trend(matrix, rolling, keyword)
+        if start is not None:
+            trend = trend[pd.to_datetime(trend['Date']) >= pd.Timestamp(start)]
+        trend = downsample_trend(trend.reset_index(drop=True), max_points)
+        if not trend.empty:
+            frames.append(trend.assign(Keyword=keyword))
+    if not frames:
+        return pd.DataFrame(columns=['Keyword', 'Date', 'Sentiment', 'Rolling Mean'])
+    trends = pd.concat(frames, ignore_index=True)
+    trends['Date'] = pd.to_datetime(trends['Date']).dt.date
+    return trends[['Keyword', 'Date', 'Sentiment', 'Rolling Mean']]
+
+def topics_table(history, keywords, start=None, end=None, n=TOPIC_LIMIT):
+    # Most frequent topic words per keyword over the range, from the daily
+    # rows' merged word counts (or their Topics, for rows written before rollups)
+    counts = {keyword: Counter() for keyword in keywords}
+    for row in _in_range(history, keywords, start, end).itertuples(index=False):
+        topic_counts = json.loads(row.TopicCounts) if isinstance(row.TopicCounts, str) else {}
+        if topic_counts:
+            counts[row.Keyword].update(topic_counts)
+        elif isinstance(row.Topics, str):
+            counts[row.Keyword].update(topic.strip() for topic in row.Topics.split(",") if topic.strip())
+    rows = [{"Keyword": keyword, "Topic": topic, "Count": count}
+            for keyword in keywords for topic, count in counts[keyword].most_common(n)]
+    return pd.DataFrame(rows, columns=['Keyword', 'Topic', 'Count'])
+
+def _json_body(generated_at, table):
+    table = table.astype(object).where(table.notna(), None)
+    return json.dumps({"generated_at": generated_at, "columns": list(table.columns),
+                       "rows": table.values.tolist()}, default=str).encode("utf-8")
+
+def _arrow_body(table):
+    import pyarrow as pa
+    batch = pa.Table.from_pandas(table, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_table(batch)
+    return sink.getvalue().to_pybytes()
+
+def _error(status, message):
+    return status, {"Content-Type": "application/json"}, json.dumps({"error": message}).encode("utf-8")
+
+class QueryApi:
+    # The endpoints, independent of the HTTP server: respond() maps a request
+    # path to (status, headers, body)
+
+    ENDPOINTS = ("/latest", "/trend", "/topics")
+
+    def __init__(self, profiles, default, store_for, check_interval=CHECK_INTERVAL, max_age=MAX_AGE):
+        self.profiles = profiles
+        self.default = default
+        self.caches = {name: ProfileCache(store_for(profile), check_interval, max_age)
+                       for name, profile in profiles.items()}
+
+    def _query(self, endpoint, params):
+        # Parameters are validated before anything is built, so errors are never cached
+        name = params.get("profile", [self.default])[0]
+        if name not in self.profiles:
+            raise BadRequest(f"Unknown profile {name!r}")
+        keywords = params.get("keyword") or self.profiles[name]["keywords"]
+        start, end = _date(params, "start"), _date(params, "end")
+        max_points = _int(params, "max_points", MAX_CHART_POINTS, low=3)
+        n = _int(params, "n", TOPIC_LIMIT, high=200)
+        arrow = params.get("format", ["json"])[0] == "arrow"
+
+        def build(history, generated_at):
+            if endpoint == "/latest":
+                table = latest_table(history, keywords)
+            elif endpoint == "/trend":
+                table = trend_table(history, keywords, start, end, max_points)
+            else:
+                table = topics_table(history, keywords, start, end, n)
+            if arrow:
+                return ARROW_CONTENT_TYPE, _arrow_body(table)
+            return "application/json", _json_body(generated_at, table)
+
+        key = (endpoint, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        return self.caches[name].response(key, build)
+
+    def respond(self, path, if_none_match=None):
+        split = urlsplit(path)
+        try:
+            if split.path == "/health":
+                return 200, {"Content-Type": "application/json"}, b'{"status": "ok"}'
+            if split.path == "/profiles":
+                body = json.dumps({"default": self.default, "profiles": self.profiles}).encode("utf-8")
+                return 200, {"Content-Type": "application/json"}, body
+            if split.path not in self.ENDPOINTS:
+                return _error(404, f"Unknown endpoint {split.path}")
+            version, (content_type, body) = self._query(split.path, parse_qs(split.query))
+        except BadRequest as e:
+            return _error(400, str(e))
+        except Exception as e:
+            return _error(500, f"Could not read the history: {e}")
+        etag = '"' + hashlib.blake2b(f"{version} {path}".encode("utf-8"), digest_size=8).hexdigest() + '"'
+        headers = {"Content-Type": content_type, "ETag": etag, "Cache-Control": f"max-age={CHECK_INTERVAL}"}
+        if if_none_match == etag:
+            return 304, headers, b""
+        return 200, headers, body
+
+def make_handler(api):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            status, headers, body = api.respond(self.path, self.headers.get("If-None-Match"))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if os.environ.get("NEWSTREND_API_ACCESS_LOG"):
+                super().log_message(format, *args)
+
+    return Handler
+
+def parse_args(argv=None):
+    # Storage options as in ingest.py, which writes what this serves
+    parser = argparse.ArgumentParser(description="Serve the stored sentiment history over HTTP/JSON.")
+    parser.add_argument("--history-uri", default=os.environ.get("NEWSTREND_HISTORY_URI"),
+                        help="Parquet history store: local directory or s3://bucket/prefix (default: $NEWSTREND_HISTORY_URI)")
+    parser.add_argument("--partition-by-keyword", action="store_true",
+                        help="The Parquet store is partitioned by keyword as well as by date")
+    parser.add_argument("--bucket", default=os.environ.get("NEWSTREND_BUCKET"),
+                        help="S3 bucket of the CSV history (default: $NEWSTREND_BUCKET)")
+    parser.add_argument("--object-key", default=os.environ.get("NEWSTREND_OBJECT_KEY"),
+                        help="S3 key of the CSV history (default: $NEWSTREND_OBJECT_KEY)")
+    parser.add_argument("--delta-log", action="store_true", default=os.environ.get("NEWSTREND_DELTA_LOG", "") not in ("", "0"),
+                        help="The CSV history is an append-only delta log (default: $NEWSTREND_DELTA_LOG)")
+    parser.add_argument("--host", default=os.environ.get("NEWSTREND_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("NEWSTREND_API_PORT", 8502)))
+    parser.add_argument("--check-interval", type=float, default=CHECK_INTERVAL,
+                        help="Seconds between checks for a new ingestion run")
+    args = parser.parse_args(argv)
+    if not args.history_uri and not (args.bucket and args.object_key):
+        parser.error("either --history-uri or --bucket and --object-key are required")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    def store_for(profile):
+        return make_history_store(history_uri=args.history_uri, bucket=args.bucket, object_key=args.object_key,
+                                  partition_by_keyword=args.partition_by_keyword,
+                                  history_key=profile["history_key"], delta_log=args.delta_log)
+
+    profiles, default = load_profiles()
+    api = QueryApi(profiles, default, store_for, check_interval=args.check_interval)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(api))
+    print(f"Serving {len(profiles)} profile(s) on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# NLP resources (NLTK models, stoplists) loaded from local copies, with the
+# network used only when no copy exists yet: a stoplist is downloaded once
+# into the NLTK data directory and read from there afterwards. NLTK itself is
+# only imported, and its data only checked, when a feature first needs it.
+#
+# Prefetch everything at image build time so containers start offline:
+#
+#   python resources.py --prefetch
+#   python resources.py --report     # cold import time of each app module
+
+NLTK_DATA_DIR = os.environ.get("NEWSTREND_NLTK_DATA", os.path.join(os.getcwd(), 'nltk_data'))
+
+SMART_STOPLIST_URL = "https://github.com/aneesha/RAKE/raw/master/SmartStoplist.txt"
+
+# NLTK resource name -> path nltk.data.find looks for
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "vader_lexicon": "sentiment/vader_lexicon.zip",
+    "stopwords": "corpora/stopwords",
+}
+
+# Seconds spent on each lazy import / resource load in this process
+timings = {}
+
+_ready = set()
+_stoplists = {}
+_lock = threading.Lock()
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+def lazy_import(module):
+    # Import a heavy module at its first use, recording how long that took
+    if module not in sys.modules:
+        with timed(f"import {module}"):
+            importlib.import_module(module)
+    return sys.modules[module]
+
+def load_nltk():
+    nltk = lazy_import("nltk")
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.append(NLTK_DATA_DIR)
+    return nltk
+
+def ensure_nltk_resource(name):
+    # Download an NLTK resource only when no local copy can be found
+    if name in _ready:
+        return
+    with _lock:
+        if name in _ready:
+            return
+        nltk = load_nltk()
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+        except LookupError:
+            with timed(f"download {name}"):
+                nltk.download(name, download_dir=NLTK_DATA_DIR, quiet=True)
+        _ready.add(name)
+
+def word_tokenize(text):
+    ensure_nltk_resource("punkt")
+    nltk = load_nltk()
+    try:
+        return nltk.word_tokenize(text)
+    except LookupError:
+        # NLTK 3.8.2+ tokenizes with punkt_tab instead of punkt
+        ensure_nltk_resource("punkt_tab")
+        return nltk.word_tokenize(text)
+
+def load_stoplist(url=SMART_STOPLIST_URL):
+    # Words of a whitespace-separated stoplist, as a frozenset
+    if url in _stoplists:
+        return _stoplists[url]
+    with _lock:
+        if url not in _stoplists:
+            name = os.path.basename(urlsplit(url).path)
+            cached_path = os.path.join(NLTK_DATA_DIR, name)
+            with timed(f"load {name}"):
+                if os.path.exists(cached_path):
+                    with open(cached_path, encoding="utf-8") as f:
+                        text = f.read()
+                else:
+                    from http_client import get
+                    text = get("stoplists", url).text
+                    os.makedirs(NLTK_DATA_DIR, exist_ok=True)
+                    with open(cached_path, "w", encoding="utf-8") as f:
+                        f.write(text)
+            _stoplists[url] = frozenset(text.split())
+    return _stoplists[url]
+
+def prefetch():
+    for name in NLTK_RESOURCES:
+        ensure_nltk_resource(name)
+    load_stoplist()
+
+def import_time(module):
+    # Wall-clock seconds to import `module` in a fresh interpreter
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    return time.perf_counter() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prefetch NLP resources and report startup timing.")
+    parser.add_argument("--prefetch", action="store_true", help="Download every NLTK resource and stoplist into the cache")
+    parser.add_argument("--report", action="store_true", help="Print the cold import time of each app module")
+    args = parser.parse_args(argv)
+    if args.prefetch:
+        prefetch()
+        for name, seconds in sorted(timings.items()):
+            print(f"{name}: {seconds:.3f}s")
+    if args.report:
+        for module in ("pipeline", "sentiment", "storage", "wordclouds", "http_client", "newstrend", "ingest"):
+            print(f"import {module}: {import_time(module):.3f}s")
+
+if __name__ == "__main__":
+    main()
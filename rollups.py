@@ -0,0 +1,138 @@
+import json
+import numpy as np
+import pandas as pd
+from collections import Counter
+from fetch_cache import url_key
+
+# Daily per-keyword rollups: the history holds at most one row per
+# (Date, Keyword), with running aggregates that absorb new articles as they
+# arrive during the day. Articles already counted in a row are recognized by
+# story cluster (near-duplicates share one, see near_duplicates.py) or URL and
+# skipped, so reloading the same results never double counts them.
+
+HISTORY_COLUMNS = ["Date", "Keyword", "Topics", "Sentiment",
+                   "Articles", "SentimentSum", "SentimentMin", "SentimentMax",
+                   "TopicCounts", "ArticleScores"]
+
+# Words shown as a row's topics, and words kept in its merged topic counts
+TOPIC_COUNT = 5
+MAX_TOPIC_WORDS = 200
+
+def top_topics(word_counts, n=TOPIC_COUNT):
+    return ', '.join(word for word, count in word_counts.most_common(n))
+
+def to_dates(values):
+    # Dates as datetime.date objects; columns that already hold them (Parquet
+    # date32 reads) are returned as they are instead of being parsed again
+    if pd.api.types.infer_dtype(values, skipna=True) == "date":
+        return values
+    return pd.to_datetime(values, errors='coerce').dt.date
+
+def normalize_history(df):
+    # Bring rows written before rollups existed (Date/Keyword/Topics/Sentiment only) to the full schema
+    df = df.copy()
+    df['Date'] = to_dates(df['Date'])
+    if 'Articles' not in df:
+        df['Articles'] = 0
+    if 'SentimentSum' not in df:
+        df['SentimentSum'] = 0.0
+    for column in ('SentimentMin', 'SentimentMax'):
+        if column not in df:
+            df[column] = df['Sentiment']
+    for column in ('TopicCounts', 'ArticleScores'):
+        if column not in df:
+            df[column] = "{}"
+    df['Articles'] = df['Articles'].fillna(0).astype(int)
+    df['SentimentSum'] = df['SentimentSum'].fillna(0.0)
+    df['SentimentMin'] = df['SentimentMin'].fillna(df['Sentiment'])
+    df['SentimentMax'] = df['SentimentMax'].fillna(df['Sentiment'])
+    df['Topics'] = df['Topics'].fillna("")
+    df['TopicCounts'] = df['TopicCounts'].fillna("{}")
+    df['ArticleScores'] = df['ArticleScores'].fillna("{}")
+    return df[HISTORY_COLUMNS]
+
+def rollup_row(date, keyword, articles, existing=None, topics=None):
+    # Fold articles (dicts with url, sentiment, word_counts and optionally story) into the day's row.
+    # `topics` (the keyword's latest keyphrases) replaces the most frequent words
+    # of the merged counts as the row's Topics when given.
+    scores = json.loads(existing['ArticleScores']) if existing is not None else {}
+    topic_counts = Counter(json.loads(existing['TopicCounts'])) if existing is not None else Counter()
+    added = 0
+    for article in articles:
+        if "sentiment" not in article:
+            continue
+        key = (article.get("story") or url_key(article["url"]))[:16]
+        if key in scores:
+            continue
+        scores[key] = article["sentiment"]
+        topic_counts.update(article.get("word_counts", {}))
+        added += 1
+    if existing is not None and not added:
+        return dict(existing)
+    return _row(date, keyword, scores, topic_counts, topics)
+
+def _row(date, keyword, scores, topic_counts, topics=None):
+    values = np.fromiter(scores.values(), dtype=float, count=len(scores))
+    return {
+        "Date": date,
+        "Keyword": keyword,
+        "Topics": topics or top_topics(topic_counts),
+        "Sentiment": float(values.mean()) if values.size else 0.0,
+        "Articles": int(values.size),
+        "SentimentSum": float(values.sum()),
+        "SentimentMin": float(values.min()) if values.size else 0.0,
+        "SentimentMax": float(values.max()) if values.size else 0.0,
+        "TopicCounts": json.dumps(dict(topic_counts.most_common(MAX_TOPIC_WORDS))),
+        "ArticleScores": json.dumps(scores),
+    }
+
+def rollups_from_results(results, date, history):
+    # Rows for `date` after folding in each analyzed keyword's articles;
+    # `history` only needs to contain that day's rows
+    history = normalize_history(history)
+    existing = {row['Keyword']: row for row in history[history['Date'] == date].to_dict('records')}
+    rows = [rollup_row(date, result["keyword"], result["articles"], existing.get(result["keyword"]),
+                       topics=result.get("topics"))
+            for result in results if "sentiment" in result]
+    return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+
+def merge_rollup_row(old, new):
+    # The row for one (Date, Keyword) written by two writers that may each lack
+    # the other's articles: `new` when it already covers every article of
+    # `old`, otherwise the union of their articles. Topic counts of the union
+    # take the larger count of each word, as shared articles can't be told apart.
+    old_scores = json.loads(old['ArticleScores'])
+    new_scores = json.loads(new['ArticleScores'])
+    if old_scores.keys() <= new_scores.keys():
+        return dict(new)
+    topic_counts = Counter(json.loads(old['TopicCounts'])) | Counter(json.loads(new['TopicCounts']))
+    return _row(new['Date'], new['Keyword'], {**old_scores, **new_scores}, topic_counts, new['Topics'])
+
+def _concat(frames):
+    # pd.concat without the empty frames: pandas warns that their columns will
+    # count towards the result's dtypes in a future version. If all of them
+    # are empty, the first is returned as it is
+    non_empty = [frame for frame in frames if not frame.empty]
+    if not non_empty:
+        return frames[0]
+    return pd.concat(non_empty, ignore_index=True)
+
+def combine_rollups(history, rows):
+    # Like upsert_rollups, but rows for the same (Date, Keyword) are merged
+    # with merge_rollup_row, in order, instead of the last one winning
+    combined = _concat([normalize_history(history), normalize_history(rows)])
+    duplicated = combined.duplicated(subset=['Date', 'Keyword'], keep=False)
+    if duplicated.any():
+        merged = {}
+        for row in combined[duplicated].to_dict('records'):
+            key = (row['Date'], row['Keyword'])
+            merged[key] = merge_rollup_row(merged[key], row) if key in merged else row
+        combined = _concat([combined[~duplicated], pd.DataFrame(list(merged.values()), columns=HISTORY_COLUMNS)])
+    return combined.sort_values(['Date', 'Keyword'], kind='stable').reset_index(drop=True)
+
+def upsert_rollups(history, rows):
+    # Replace the (Date, Keyword) rows of `history` present in `rows`; also
+    # collapses duplicate rows left by older versions, keeping the last one
+    combined = _concat([normalize_history(history), normalize_history(rows)])
+    combined = combined.drop_duplicates(subset=['Date', 'Keyword'], keep='last')
+    return combined.sort_values(['Date', 'Keyword'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from resources import ensure_nltk_resource, timed
+
+# VADER scoring with one long-lived analyzer per process. Articles are scored
+# one by one and summarized, instead of scoring a single concatenated blob, so
+# the per-article scores can be stored and aggregates updated as articles arrive.
+
+# Scores are VADER compound scores scaled to -100..100 for the gauge;
+# +/-5 is VADER's usual cut-off between neutral and positive/negative.
+POLARITY_THRESHOLD = 5
+
+# Batches holding at least this much text are scored on a process pool.
+# VADER costs roughly a microsecond or two per character, so the threshold is
+# a few hundred milliseconds of work on one core: well above the pool's
+# pickling and IPC overhead. A keyword's snippets (tens of ~200-character
+# texts) stay in-process; with NEWSTREND_FETCH_BODIES its article pages (up to
+# MAX_BODY_CHARS each) cross it after a few dozen articles. There is one pool
+# per process, created on first use and shared by every thread; its workers
+# are started by a forkserver (spawn where there is none), never forked from
+# this multithreaded process, where another thread may hold the NLTK or
+# analyzer locks. NEWSTREND_SENTIMENT_PROCESSES sizes it (default: CPU count).
+PROCESS_POOL_MIN_CHARS = 200000
+PROCESS_POOL_CHUNK_CHARS = 50000
+PROCESS_POOL_SIZE = int(os.environ.get("NEWSTREND_SENTIMENT_PROCESSES", 0)) or None
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_analyzer():
+    # Loading the lexicon is the expensive part, so it happens once per process,
+    # on first use; process pool workers load their own copy the same way
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                ensure_nltk_resource("vader_lexicon")
+                with timed("load vader_lexicon"):
+                    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+                    _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+def _score_chunk(texts):
+    analyzer = get_analyzer()
+    return [analyzer.polarity_scores(text)['compound'] * 100 for text in texts]
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_SIZE,
+                                            mp_context=multiprocessing.get_context(method))
+    return _pool
+
+def _drop_pool(pool):
+    # Forget a broken pool so the next large batch starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _chunks(texts, size):
+    # Consecutive runs of texts holding about `size` characters each
+    chunk, chars = [], 0
+    for text in texts:
+        chunk.append(text)
+        chars += len(text)
+        if chars >= size:
+            yield chunk
+            chunk, chars = [], 0
+    if chunk:
+        yield chunk
+
+def score_texts(texts):
+    # Score each text separately; returns a float array in the order of `texts`
+    texts = list(texts)
+    if sum(map(len, texts)) < PROCESS_POOL_MIN_CHARS:
+        return np.asarray(_score_chunk(texts), dtype=float)
+    chunks = list(_chunks(texts, PROCESS_POOL_CHUNK_CHARS))
+    pool = get_pool()
+    try:
+        scores = [score for chunk in pool.map(_score_chunk, chunks) for score in chunk]
+    except BrokenProcessPool:
+        _drop_pool(pool)
+        scores = _score_chunk(texts)
+    return np.asarray(scores, dtype=float)
+
+def summarize_scores(scores):
+    scores = np.asarray(scores, dtype=float)
+    if scores.size == 0:
+        return {"count": 0, "mean": 0.0, "median": 0.0, "stdev": 0.0, "min": 0.0, "max": 0.0,
+                "positive": 0, "negative": 0}
+    return {
+        "count": int(scores.size),
+        "mean": float(scores.mean()),
+        "median": float(np.median(scores)),
+        "stdev": float(scores.std(ddof=1)) if scores.size > 1 else 0.0,
+        "min": float(scores.min()),
+        "max": float(scores.max()),
+        "positive": int((scores >= POLARITY_THRESHOLD).sum()),
+        "negative": int((scores <= -POLARITY_THRESHOLD).sum()),
+    }
+
+def score_batch(texts):
+    # Per-article scores plus their distribution statistics
+    scores = score_texts(texts)
+    return scores.tolist(), summarize_scores(scores)
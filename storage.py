@@ -0,0 +1,408 @@
+import json
+import os
+import posixpath
+import random
+import time
+import uuid
+import pandas as pd
+from functools import lru_cache
+from rollups import HISTORY_COLUMNS, normalize_history, to_dates, upsert_rollups, combine_rollups
+from s3_client import get_s3_client, open_body, upload_csv
+
+# Historical sentiment stores and the snapshot of the latest pipeline run.
+# Two backends share one interface (read / iter_chunks / upsert / read_latest / write_latest):
+#   CsvHistoryStore     - the original single CSV object in S3
+#   ParquetHistoryStore - date-partitioned Parquet under a local directory or s3:// URI
+#   DeltaLogHistoryStore - append-only delta log in S3, safe for concurrent writers
+# The history holds one daily rollup row per (Date, Keyword) (see rollups.py);
+# upsert replaces those rows. Reads take keyword and date-range filters and a
+# column selection, which the Parquet store pushes down to the dataset scan
+# (partition pruning, row-group statistics); iter_chunks streams the matching
+# rows in bounded chunks. Errors are raised; callers decide how to report them.
+# CSV objects are stored compressed and streamed both ways (see s3_client.py).
+# boto3 and pyarrow are imported by the backend that needs them, on first use.
+
+@lru_cache(maxsize=None)
+def history_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("Date", pa.date32()),
+        ("Keyword", pa.string()),
+        ("Topics", pa.string()),
+        ("Sentiment", pa.float64()),
+        ("Articles", pa.int64()),
+        ("SentimentSum", pa.float64()),
+        ("SentimentMin", pa.float64()),
+        ("SentimentMax", pa.float64()),
+        ("TopicCounts", pa.string()),
+        ("ArticleScores", pa.string()),
+    ])
+
+LATEST_NAME = "_latest.json"
+
+# Rows per chunk yielded by iter_chunks
+CHUNK_ROWS = 50000
+
+# Delta log (DeltaLogHistoryStore)
+MANIFEST_NAME = "manifest.json"
+COMMIT_RETRIES = 10
+# Pending deltas after which ingest.py compacts the log
+COMPACT_AFTER_DELTAS = 50
+# Age before an unreferenced delta or snapshot object is deleted
+GARBAGE_GRACE_SECONDS = 3600
+# Error codes of a conditional put that lost to a concurrent write
+CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict")
+# Error codes of a head_object on a key that doesn't exist
+MISSING_CODES = ("404", "NoSuchKey", "NotFound")
+
+def make_s3_client(aws_access_key_id=None, aws_secret_access_key=None, region=None):
+    # The process-wide client for these credentials (see s3_client.py)
+    return get_s3_client(aws_access_key_id, aws_secret_access_key, region)
+
+def latest_key_for(object_key):
+    # The latest-run snapshot lives next to the history CSV
+    base = object_key[:-len(".csv")] if object_key.endswith(".csv") else object_key
+    return f"{base}_latest.json"
+
+def read_history(s3, bucket, object_key):
+    response = s3.get_object(Bucket=bucket, Key=object_key)
+    historical_data = pd.read_csv(open_body(response['Body']))
+    historical_data['Date'] = pd.to_datetime(historical_data['Date'], errors='coerce').dt.date
+    return historical_data
+
+def empty_history():
+    return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+def write_history(s3, bucket, object_key, df):
+    upload_csv(s3, bucket, object_key, df)
+
+def select_columns(df, columns=None):
+    # The full normalized schema, or just `columns` with Date parsed
+    if columns is None:
+        return normalize_history(df)
+    df = df[list(columns)].copy()
+    if 'Date' in df:
+        df['Date'] = to_dates(df['Date'])
+    return df
+
+def concat_chunks(chunks, columns=None):
+    frames = list(chunks)
+    if not frames:
+        return empty_history() if columns is None else pd.DataFrame(columns=list(columns))
+    return pd.concat(frames, ignore_index=True)
+
+def filter_history(df, keywords=None, start=None, end=None):
+    # In-memory equivalent of the filters ParquetHistoryStore pushes down
+    mask = pd.Series(True, index=df.index)
+    if keywords is not None:
+        mask &= df['Keyword'].isin(list(keywords))
+    if start is not None:
+        mask &= df['Date'] >= start
+    if end is not None:
+        mask &= df['Date'] <= end
+    return df[mask]
+
+class CsvHistoryStore:
+    # The whole history is one CSV object: every read downloads all of it and
+    # every upsert rewrites it.
+
+    def __init__(self, s3, bucket, object_key):
+        self.s3 = s3
+        self.bucket = bucket
+        self.object_key = object_key
+
+    def read(self, keywords=None, start=None, end=None, columns=None):
+        return concat_chunks(self.iter_chunks(keywords, start, end, columns), columns)
+
+    def iter_chunks(self, keywords=None, start=None, end=None, columns=None, chunk_rows=CHUNK_ROWS):
+        # The object is still downloaded whole, but decompressed, parsed and
+        # filtered a chunk at a time, so only matching rows (and columns) are ever held
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.object_key)
+        except self.s3.exceptions.NoSuchKey:
+            return
+        # Columns every version of the CSV has, which normalize_history builds on
+        needed = None if columns is None else set(columns) | {'Date', 'Keyword', 'Topics', 'Sentiment'}
+        for chunk in pd.read_csv(open_body(response['Body']), chunksize=chunk_rows,
+                                 usecols=None if needed is None else (lambda column: column in needed)):
+            chunk = filter_history(normalize_history(chunk), keywords, start, end)
+            if not chunk.empty:
+                yield chunk if columns is None else chunk[list(columns)]
+
+    def upsert(self, rows):
+        write_history(self.s3, self.bucket, self.object_key, upsert_rollups(self.read(), rows))
+
+    def read_latest(self):
+        response = self.s3.get_object(Bucket=self.bucket, Key=latest_key_for(self.object_key))
+        return json.loads(response['Body'].read())
+
+    def write_latest(self, snapshot):
+        self.s3.put_object(Bucket=self.bucket, Key=latest_key_for(self.object_key),
+                           Body=json.dumps(snapshot).encode("utf-8"),
+                           ContentType="application/json")
+
+    def __repr__(self):
+        return f"s3://{self.bucket}/{self.object_key}"
+
+class ParquetHistoryStore:
+    # Hive-partitioned Parquet dataset: <root>/Date=YYYY-MM-DD[/Keyword=...]/part-*.parquet.
+    # Upserts rewrite only the partitions of the days they touch, and reads only
+    # open the partitions matching the filters. partition_by_keyword must stay
+    # the same for the life of a store.
+
+    def __init__(self, uri, partition_by_keyword=False, aws_access_key_id=None, aws_secret_access_key=None, region=None):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as pafs
+        if uri.startswith("s3://"):
+            self.filesystem = pafs.S3FileSystem(access_key=aws_access_key_id, secret_key=aws_secret_access_key, region=region)
+            self.root = uri[len("s3://"):].rstrip("/")
+        else:
+            self.filesystem = pafs.LocalFileSystem()
+            self.root = os.path.abspath(uri)
+        self.uri = uri
+        self.partition_by_keyword = partition_by_keyword
+        fields = ["Date", "Keyword"] if partition_by_keyword else ["Date"]
+        self.partitioning = ds.partitioning(pa.schema([history_schema().field(name) for name in fields]), flavor="hive")
+
+    def _dataset(self):
+        import pyarrow.dataset as ds
+        return ds.dataset(self.root, format="parquet", filesystem=self.filesystem,
+                          partitioning=self.partitioning, schema=history_schema())
+
+    def read(self, keywords=None, start=None, end=None, columns=None):
+        return concat_chunks(self.iter_chunks(keywords, start, end, columns), columns)
+
+    def iter_chunks(self, keywords=None, start=None, end=None, columns=None, chunk_rows=CHUNK_ROWS):
+        # Date filters prune partitions (and Keyword ones too when partitioned
+        # by keyword); otherwise Keyword is matched against row-group statistics
+        import pyarrow.dataset as ds
+        try:
+            dataset = self._dataset()
+        except FileNotFoundError:
+            return
+        expression = None
+        if keywords is not None:
+            expression = ds.field("Keyword").isin(list(keywords))
+        if start is not None:
+            condition = ds.field("Date") >= start
+            expression = condition if expression is None else expression & condition
+        if end is not None:
+            condition = ds.field("Date") <= end
+            expression = condition if expression is None else expression & condition
+        # Batches already have the typed schema (Date as date32, read as
+        # datetime.date), so they need no normalizing
+        scanner = dataset.scanner(filter=expression, columns=list(columns or HISTORY_COLUMNS), batch_size=chunk_rows)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def upsert(self, rows):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        rows = normalize_history(rows).dropna(subset=['Date'])
+        if rows.empty:
+            return
+        # Each touched day is rewritten whole: its current rows merged with the
+        # new ones, replacing the files previously in its partition(s)
+        days = sorted(set(rows['Date']))
+        try:
+            existing = normalize_history(self._dataset().to_table(filter=ds.field("Date").isin(days)).to_pandas())
+        except FileNotFoundError:
+            existing = empty_history()
+        merged = upsert_rollups(existing, rows)
+        table = pa.Table.from_pandas(merged, schema=history_schema(), preserve_index=False)
+        # pyarrow refuses to write more than max_partitions (default 1024)
+        # partitions at once, which an import of years of history exceeds
+        keys = ['Date', 'Keyword'] if self.partition_by_keyword else ['Date']
+        ds.write_dataset(table, self.root, format="parquet", filesystem=self.filesystem,
+                         partitioning=self.partitioning,
+                         max_partitions=max(1024, len(merged[keys].drop_duplicates())),
+                         basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                         existing_data_behavior="delete_matching")
+
+    def read_latest(self):
+        with self.filesystem.open_input_stream(f"{self.root}/{LATEST_NAME}") as stream:
+            return json.loads(stream.read())
+
+    def write_latest(self, snapshot):
+        self.filesystem.create_dir(self.root, recursive=True)
+        with self.filesystem.open_output_stream(f"{self.root}/{LATEST_NAME}") as stream:
+            stream.write(json.dumps(snapshot).encode("utf-8"))
+
+    def __repr__(self):
+        return self.uri
+
+class DeltaLogHistoryStore:
+    # Append-only log over S3 for concurrent writers. Under <prefix>/ live
+    # immutable delta objects (the rows of one upsert) and snapshots, tracked by
+    # manifest.json: {"version": n, "snapshot": key or null, "deltas": [key, ...]}.
+    # An upsert writes one delta with only its rows and appends it to the
+    # manifest with a conditional put (If-Match on the manifest's ETag). When
+    # another writer committed first, the put fails and the append is retried
+    # on the new manifest, so no commit is ever lost. Readers merge the snapshot
+    # with the pending deltas in order, combining rows of the same (Date,
+    # Keyword) (rollups.combine_rollups); compact() folds the deltas into a new
+    # snapshot. The legacy CSV object, when there is one, is the first snapshot.
+
+    def __init__(self, s3, bucket, prefix, legacy_key=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/") + "/"
+        self.legacy_key = legacy_key
+
+    def _manifest(self):
+        # (manifest, ETag), or a fresh manifest and None when there is none yet
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + MANIFEST_NAME)
+        except self.s3.exceptions.NoSuchKey:
+            return {"version": 0, "snapshot": self._legacy_snapshot(), "deltas": []}, None
+        return json.loads(response['Body'].read()), response['ETag']
+
+    def _legacy_snapshot(self):
+        # Only a definite "not found" means there is no legacy CSV; any other
+        # failure (throttling, credentials) must not commit a manifest without it
+        from botocore.exceptions import ClientError
+        if self.legacy_key is None:
+            return None
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self.legacy_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in MISSING_CODES:
+                return None
+            raise
+        return self.legacy_key
+
+    def _commit(self, update):
+        # Apply update(manifest) -> new manifest (or None to give up) and store it
+        # only if nobody else committed in between; retried on conflicts
+        from botocore.exceptions import ClientError
+        for attempt in range(COMMIT_RETRIES):
+            manifest, etag = self._manifest()
+            updated = update(manifest)
+            if updated is None:
+                return None
+            updated["version"] = manifest["version"] + 1
+            condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+            try:
+                self.s3.put_object(Bucket=self.bucket, Key=self.prefix + MANIFEST_NAME,
+                                   Body=json.dumps(updated).encode("utf-8"),
+                                   ContentType="application/json", **condition)
+                return updated
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in CONFLICT_CODES:
+                    raise
+                time.sleep(min(0.05 * 2 ** attempt, 2) * random.uniform(0.5, 1.0))
+        raise RuntimeError(f"Gave up committing to s3://{self.bucket}/{self.prefix}{MANIFEST_NAME} "
+                           f"after {COMMIT_RETRIES} conflicting writes")
+
+    def _new_key(self, kind):
+        return f"{self.prefix}{kind}/{time.time_ns()}-{uuid.uuid4().hex[:8]}.csv"
+
+    def _put_rows(self, key, rows):
+        write_history(self.s3, self.bucket, key, rows)
+
+    def _read_rows(self, key, keywords=None, start=None, end=None):
+        return CsvHistoryStore(self.s3, self.bucket, key).iter_chunks(keywords, start, end)
+
+    def read(self, keywords=None, start=None, end=None, columns=None):
+        return concat_chunks(self.iter_chunks(keywords, start, end, columns), columns)
+
+    def iter_chunks(self, keywords=None, start=None, end=None, columns=None, chunk_rows=CHUNK_ROWS):
+        # Snapshot chunks with the pending deltas' rows merged in; the deltas
+        # are small and held whole, the snapshot is streamed
+        manifest, _ = self._manifest()
+        pending = empty_history()
+        for key in manifest["deltas"]:
+            pending = combine_rollups(pending, concat_chunks(self._read_rows(key, keywords, start, end)))
+        pending_keys = pd.MultiIndex.from_frame(pending[['Date', 'Keyword']])
+        merged = pd.Series(False, index=pending.index)
+        if manifest["snapshot"]:
+            for chunk in self._read_rows(manifest["snapshot"], keywords, start, end):
+                overlap = pending_keys.isin(pd.MultiIndex.from_frame(chunk[['Date', 'Keyword']]))
+                if overlap.any():
+                    chunk = combine_rollups(chunk, pending[overlap])
+                    merged |= overlap
+                yield select_columns(chunk, columns) if columns else chunk
+        rest = pending[~merged.to_numpy()]
+        if not rest.empty:
+            yield select_columns(rest, columns) if columns else rest
+
+    def upsert(self, rows):
+        # O(new rows): one small delta object plus a manifest update
+        rows = normalize_history(rows).dropna(subset=['Date'])
+        if rows.empty:
+            return
+        key = self._new_key("deltas")
+        self._put_rows(key, rows)
+        self._commit(lambda manifest: {**manifest, "deltas": manifest["deltas"] + [key]})
+
+    def compact(self):
+        # Fold the pending deltas into a new snapshot; returns how many were folded.
+        # Deltas committed meanwhile stay pending, and a concurrent compaction
+        # makes this one give up. Objects no longer referenced are removed once
+        # older than GARBAGE_GRACE_SECONDS, so in-flight readers can finish.
+        manifest, _ = self._manifest()
+        folded = manifest["deltas"]
+        if folded:
+            key = self._new_key("snapshots")
+            self._put_rows(key, self.read())
+
+            def swap(current):
+                if current["snapshot"] != manifest["snapshot"] or current["deltas"][:len(folded)] != folded:
+                    return None
+                return {**current, "snapshot": key, "deltas": current["deltas"][len(folded):]}
+
+            if self._commit(swap) is None:
+                self.s3.delete_object(Bucket=self.bucket, Key=key)
+                return 0
+        self._collect_garbage()
+        return len(folded)
+
+    def _collect_garbage(self):
+        manifest, _ = self._manifest()
+        referenced = set(manifest["deltas"]) | {manifest["snapshot"]}
+        cutoff = time.time() - GARBAGE_GRACE_SECONDS
+        for kind in ("deltas", "snapshots"):
+            for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=f"{self.prefix}{kind}/"):
+                for item in page.get("Contents", []):
+                    if item["Key"] not in referenced and item["LastModified"].timestamp() < cutoff:
+                        self.s3.delete_object(Bucket=self.bucket, Key=item["Key"])
+
+    def pending_deltas(self):
+        return len(self._manifest()[0]["deltas"])
+
+    def read_latest(self):
+        response = self.s3.get_object(Bucket=self.bucket, Key=latest_key_for(self.legacy_key or self.prefix.rstrip("/")))
+        return json.loads(response['Body'].read())
+
+    def write_latest(self, snapshot):
+        self.s3.put_object(Bucket=self.bucket, Key=latest_key_for(self.legacy_key or self.prefix.rstrip("/")),
+                           Body=json.dumps(snapshot).encode("utf-8"),
+                           ContentType="application/json")
+
+    def __repr__(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+def make_history_store(history_uri=None, bucket=None, object_key=None, partition_by_keyword=False,
+                       aws_access_key_id=None, aws_secret_access_key=None, region=None, history_key=None,
+                       delta_log=False):
+    # Parquet when a history URI is configured, otherwise the CSV object, or
+    # with delta_log the delta log next to it (<object_key without .csv>/),
+    # which starts from the CSV object as its first snapshot.
+    # history_key selects a profile's own history as a sibling of the configured
+    # one (never inside it, where the base dataset would pick its files up):
+    # <history_uri's parent>/<history_key> or <object_key's directory>/<history_key>.csv
+    if history_key and history_uri:
+        history_uri = posixpath.join(posixpath.dirname(history_uri.rstrip('/')), history_key)
+    elif history_key:
+        object_key = posixpath.join(posixpath.dirname(object_key), f"{history_key}.csv")
+    if history_uri:
+        return ParquetHistoryStore(history_uri, partition_by_keyword=partition_by_keyword,
+                                   aws_access_key_id=aws_access_key_id,
+                                   aws_secret_access_key=aws_secret_access_key, region=region)
+    s3 = make_s3_client(aws_access_key_id, aws_secret_access_key, region)
+    if delta_log:
+        prefix = object_key[:-len(".csv")] if object_key.endswith(".csv") else object_key
+        return DeltaLogHistoryStore(s3, bucket, prefix, legacy_key=object_key)
+    return CsvHistoryStore(s3, bucket, object_key)
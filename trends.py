@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# Shaping of the history into the series shown in the sentiment trend charts.
+# The whole history is pivoted once into a Date x Keyword matrix; each
+# keyword's trend is then just a column of it. Charts are downsampled here,
+# before they reach the browser, so each stays under MAX_CHART_POINTS points
+# however long the history is.
+
+# Days in the rolling mean drawn over each trend
+ROLLING_WINDOW = 7
+
+# History columns the trends are built from; reads for them select only these
+TREND_COLUMNS = ['Date', 'Keyword', 'Sentiment']
+
+# Most points drawn in one chart
+MAX_CHART_POINTS = 500
+
+# Coarser periods tried, in order, when daily points exceed the budget
+RESAMPLE_PERIODS = [('W', 7), ('MS', 30), ('QS', 91)]
+
+# Fewest points drawn per line of the comparison chart; it shows at most
+# max_points // MIN_POINTS_PER_KEYWORD keywords, so its total stays in budget
+MIN_POINTS_PER_KEYWORD = 2
+# Schools offered at once in the comparison chart (the page's default selection)
+MAX_COMPARISON_KEYWORDS = 20
+
+def sentiment_matrix(history):
+    # Daily Date x Keyword sentiment over the full date span. Gaps between a
+    # keyword's first and last observation are forward-filled; days before the
+    # first and after the last stay empty, as in the per-keyword reindex.
+    dates = pd.to_datetime(history['Date'], errors='coerce')
+    data = history.assign(Date=dates).dropna(subset=['Date'])
+    if data.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Date'))
+    # The last row of a day wins when a keyword was stored more than once that day
+    daily = data.pivot_table(index='Date', columns='Keyword', values='Sentiment', aggfunc='last', sort=True)
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), name='Date'))
+    return daily.ffill().where(daily.bfill().notna())
+
+def rolling_matrix(matrix, window=ROLLING_WINDOW):
+    return matrix.rolling(window, min_periods=1).mean()
+
+def materialize_trends(history, window=ROLLING_WINDOW):
+    matrix = sentiment_matrix(history)
+    return matrix, rolling_matrix(matrix, window)
+
+def keyword_trend(matrix, rolling, keyword):
+    # One keyword's trend as Date / Sentiment / Rolling Mean rows, for charting
+    if keyword not in matrix.columns:
+        return pd.DataFrame(columns=['Date', 'Sentiment', 'Rolling Mean'])
+    trend = pd.DataFrame({'Sentiment': matrix[keyword], 'Rolling Mean': rolling[keyword]})
+    return trend.dropna(subset=['Sentiment']).rename_axis('Date').reset_index()
+
+def resample_period(days, max_points=MAX_CHART_POINTS):
+    # The finest period (None for daily) that fits `days` days into max_points
+    if days <= max_points:
+        return None
+    for period, length in RESAMPLE_PERIODS:
+        if days / length <= max_points:
+            return period
+    return RESAMPLE_PERIODS[-1][0]
+
+def lttb(x, y, max_points):
+    # Largest-Triangle-Three-Buckets: indices of max_points of the series
+    # that keep its visual shape (first and last point always included)
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = [0]
+    for i in range(max_points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        following = slice(end, max(edges[i + 2] if i + 2 < len(edges) else n, end + 1))
+        mean_x, mean_y = x[following].mean(), y[following].mean()
+        previous = selected[-1]
+        areas = np.abs((x[previous] - mean_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (mean_y - y[previous]))
+        selected.append(start + int(np.argmax(areas)))
+    selected.append(n - 1)
+    return np.asarray(selected)
+
+def downsample_trend(trend, max_points=MAX_CHART_POINTS):
+    # A keyword_trend frame of at most max_points rows: weekly, monthly or
+    # quarterly means when the span calls for them, then LTTB on what is left
+    if len(trend) <= max_points:
+        return trend
+    dates = pd.to_datetime(trend['Date'])
+    period = resample_period((dates.max() - dates.min()).days + 1, max_points)
+    if period:
+        trend = (trend.assign(Date=dates).set_index('Date').resample(period).mean()
+                 .dropna(subset=['Sentiment']).rename_axis('Date').reset_index())
+    if len(trend) > max_points:
+        x = pd.to_datetime(trend['Date']).to_numpy().astype('int64').astype(float)
+        trend = trend.iloc[lttb(x, trend['Sentiment'].to_numpy(dtype=float), max_points)].reset_index(drop=True)
+    return trend
+
+def comparison_trends(rolling, keywords, max_points=MAX_CHART_POINTS):
+    # Long Date / Keyword / Rolling Mean rows of several keywords' rolling
+    # means, on one shared (resampled) date axis, at most max_points in total.
+    # Only the first max_points // MIN_POINTS_PER_KEYWORD keywords are drawn.
+    keywords = [keyword for keyword in keywords if keyword in rolling.columns]
+    keywords = keywords[:max(1, max_points // MIN_POINTS_PER_KEYWORD)]
+    if not keywords or rolling.empty:
+        return pd.DataFrame(columns=['Date', 'Keyword', 'Rolling Mean'])
+    matrix = rolling[keywords]
+    per_keyword = max(1, max_points // len(keywords))
+    period = resample_period(len(matrix), per_keyword)
+    if period:
+        matrix = matrix.resample(period).mean()
+    if len(matrix) > per_keyword:
+        matrix = matrix.iloc[np.linspace(0, len(matrix) - 1, per_keyword).astype(int)]
+    return (matrix.rename_axis('Date').reset_index()
+            .melt(id_vars='Date', var_name='Keyword', value_name='Rolling Mean')
+            .dropna(subset=['Rolling Mean']))
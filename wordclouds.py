@@ -0,0 +1,47 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from resources import lazy_import
+
+# Word clouds rendered straight to PNG bytes (no matplotlib figures), with an
+# in-process LRU cache keyed by a digest of (keyword, frequencies, size) so an
+# unchanged keyword is never rasterized twice.
+
+WORDCLOUD_WIDTH = 800
+WORDCLOUD_HEIGHT = 800
+
+# Most PNGs kept in memory; each is typically 100-300 KB
+WORDCLOUD_CACHE_SIZE = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def render_wordcloud_png(word_counts, width=WORDCLOUD_WIDTH, height=WORDCLOUD_HEIGHT):
+    WordCloud = lazy_import("wordcloud").WordCloud
+    wordcloud = WordCloud(width=width, height=height,
+                          background_color='white',
+                          min_font_size=10).generate_from_frequencies(word_counts)
+    buffer = BytesIO()
+    wordcloud.to_image().save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+def wordcloud_key(keyword, word_counts, width=WORDCLOUD_WIDTH, height=WORDCLOUD_HEIGHT):
+    digest = hashlib.sha1(f"{keyword}\0{width}x{height}".encode("utf-8"))
+    for word, count in sorted(word_counts.items()):
+        digest.update(f"\0{word}\0{count}".encode("utf-8"))
+    return digest.hexdigest()
+
+def wordcloud_png(keyword, word_counts, width=WORDCLOUD_WIDTH, height=WORDCLOUD_HEIGHT):
+    key = wordcloud_key(keyword, word_counts, width, height)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    png = render_wordcloud_png(word_counts, width, height)
+    with _cache_lock:
+        _cache[key] = png
+        _cache.move_to_end(key)
+        while len(_cache) > WORDCLOUD_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return png